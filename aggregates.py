@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+
+from free_text import categorize
+from schema import (AGE, CATEGORY_ORDERS, CONTACT, COUNTRY, EASE, EDUCATION, FIND, FREQUENCY, INTERNET, LANGUAGE,
+                    ONLINE_SERVICES, SMARTPHONE, order_categories)
+
+
+DIMENSIONS = [COUNTRY, AGE, EDUCATION]
+QUESTIONS = [FIND, COUNTRY, LANGUAGE, EASE, FREQUENCY, SMARTPHONE, INTERNET, ONLINE_SERVICES, CONTACT]
+# question pairs charted against each other (treemap)
+PAIRS = [(INTERNET, SMARTPHONE)]
+# respondents kept for row-level views (raw data sample, completion-time strip)
+SAMPLE_SIZE = 5000
+
+
+def combination_counts(data):
+    # One multi-key groupby over every charted column gives the count of each distinct answer
+    # combination; all chart tables are marginals of it, so rows are only scanned once.
+    columns = [c for c in dict.fromkeys(QUESTIONS + DIMENSIONS) if c in data]
+    return data.groupby(columns, dropna=False, observed=True).size()
+
+
+def build_cube(data):
+    return cube_from_counts(combination_counts(data))
+
+
+def cube_from_counts(full):
+    frame = full.rename('count').reset_index()
+    columns = list(frame.columns[:-1])
+    # counts summed across chunks lose their categorical levels, so restore the report order here
+    for column in columns:
+        categories = order_categories(column, list(frame[column].dropna().unique()))
+        frame[column] = pd.Categorical(frame[column], categories=categories, ordered=True)
+
+    def marginal(keys):
+        return frame.groupby(list(keys), observed=True)['count'].sum()
+
+    cube = {}
+    for question in QUESTIONS:
+        if question not in columns:
+            continue
+        cube[question, None] = marginal([question])
+        for dimension in DIMENSIONS:
+            if dimension in columns and dimension != question:
+                cube[question, dimension] = marginal([dimension, question])
+    for pair in PAIRS:
+        if all(c in columns for c in pair):
+            cube[pair] = marginal(pair)
+    return cube
+
+
+def counts(cube, question, dimension=None, value=None):
+    # Respondent counts per answer of `question`, optionally restricted to dimension == value.
+    if dimension is None:
+        table = cube[question, None]
+    else:
+        try:
+            table = cube[question, dimension].xs(value, level=0)
+        except KeyError:
+            return pd.Series(dtype='int64', index=pd.Index([], name=question))
+    return table[table > 0]
+
+
+def add_counts(total, part):
+    if total is None:
+        return part
+    combined = pd.concat([total, part])
+    return combined.groupby(level=list(range(combined.index.nlevels)), dropna=False, observed=True).sum()
+
+
+def summarize(chunks, summary=None, taxonomy=None):
+    # Fold cleaned survey chunks into running totals. Everything kept is a count table bounded by
+    # the number of distinct answers/days/seconds/free-text categories, plus a fixed-size sample,
+    # so memory does not grow with the export.
+    if summary is None:
+        summary = {'respondents': 0, 'final_respondents': 0, 'combinations': None, 'daily': None,
+                   'hourly': None, 'durations': None, 'free_text': None, 'sample': None}
+    for chunk in chunks:
+        summary['respondents'] += len(chunk)
+        chunk = chunk[chunk['duplicated_contact'] == 0]
+        summary['final_respondents'] += len(chunk)
+        submitted = chunk['_submission_time']
+        summary['combinations'] = add_counts(summary['combinations'], combination_counts(chunk))
+        summary['daily'] = add_counts(summary['daily'], submitted.groupby(submitted.dt.date).size())
+        summary['hourly'] = add_counts(summary['hourly'], submitted.groupby(submitted.dt.hour).size())
+        # whole seconds is enough resolution for the reported median and bounds the table size
+        seconds = chunk['time_taken'].dt.total_seconds().round().rename('seconds')
+        summary['durations'] = add_counts(summary['durations'],
+                                          chunk.groupby([chunk[EDUCATION], seconds], dropna=False, observed=True).size())
+        if taxonomy:
+            coded = categorize(chunk, taxonomy)
+            if coded is not None:
+                summary['free_text'] = add_counts(summary['free_text'], coded)
+        summary['sample'] = sample_rows(summary['sample'], chunk)
+    summary['cube'] = cube_from_counts(summary['combinations'])
+    return summary
+
+
+def merge_counts(tables):
+    # Sum count tables from different waves. Levels whose categories differ between waves come
+    # back as plain values, so the report order is restored like in cube_from_counts.
+    total = None
+    for table in tables:
+        total = add_counts(total, table)
+    frame = total.rename('count').reset_index()
+    columns = list(frame.columns[:-1])
+    for column in columns:
+        if column in CATEGORY_ORDERS:
+            categories = order_categories(column, list(frame[column].dropna().unique()))
+            frame[column] = pd.Categorical(frame[column], categories=categories, ordered=True)
+    return frame.groupby(columns, dropna=False, observed=True)['count'].sum()
+
+
+def merge_summaries(summaries):
+    # One summary over several waves. Cube marginals are summed key by key rather than rebuilt
+    # from the combination tables, so waves served from an artifact (which has none) merge too.
+    if len(summaries) == 1:
+        return summaries[0]
+    merged = {'respondents': sum(s['respondents'] for s in summaries),
+              'final_respondents': sum(s['final_respondents'] for s in summaries)}
+    for name in ['daily', 'hourly', 'durations']:
+        merged[name] = merge_counts([s[name] for s in summaries])
+    keys = dict.fromkeys(key for s in summaries for key in s['cube'])
+    merged['cube'] = {key: merge_counts([s['cube'][key] for s in summaries if key in s['cube']]) for key in keys}
+    samples = [s['sample'] for s in summaries if s['sample'] is not None]
+    merged['sample'] = sample_rows(None, pd.concat(samples, ignore_index=True)) if samples else None
+    return merged
+
+
+def sample_rows(sample, chunk):
+    # Bottom-k sample on a hash of _id: uniform, and the same rows win whatever the chunking.
+    rows = chunk if sample is None else pd.concat([sample, chunk])
+    keys = pd.util.hash_array(rows['_id'].to_numpy())
+    return rows.iloc[np.sort(np.argsort(keys, kind='stable')[:SAMPLE_SIZE])]
+
+
+def median_seconds(durations):
+    # exact median of the binned durations (mean of the two middle values for an even count)
+    counts = durations.groupby(level='seconds').sum().sort_index()
+    counts = counts[counts.index.notna()]
+    total = counts.sum()
+    if not total:
+        return float('nan')
+    ranks = counts.cumsum().to_numpy()
+    values = counts.index.to_numpy()
+    lower = values[np.searchsorted(ranks, (total - 1) // 2 + 1)]
+    upper = values[np.searchsorted(ranks, total // 2 + 1)]
+    return (lower + upper) / 2
+
+
+def duration_bins(durations, bins=40):
+    # Log-spaced histogram of completion times per education level, built from the per-second
+    # counts, so the chart payload is bins x levels whatever the number of respondents.
+    table = durations[durations.index.get_level_values('seconds').notna()].rename('count').reset_index()
+    seconds = table['seconds'].clip(lower=1).to_numpy()
+    if not len(seconds):
+        return pd.DataFrame(columns=[EDUCATION, 'seconds', 'count'])
+    edges = np.geomspace(1, seconds.max() + 1, bins + 1)
+    centers = np.sqrt(edges[:-1] * edges[1:])
+    frames = []
+    for level, group in table.groupby(EDUCATION, dropna=False, sort=False):
+        weights, _ = np.histogram(seconds[group.index], bins=edges, weights=group['count'])
+        frames.append(pd.DataFrame({EDUCATION: level, 'seconds': centers, 'count': weights.astype(int)}))
+    return pd.concat(frames, ignore_index=True)
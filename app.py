@@ -4,83 +4,124 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 
-
-DATE_COLUMNS = ['start', 'end', '_submission_time']
-DATA_URL = 'https://docs.google.com/spreadsheets/d/e/2PACX-1vTKoYQrQUedW9pe9OR5N29XFAHvJBBrXIKmmG3E-nVRy-2ZPTSt1TjzwVe8KQq3Ng/pub?gid=1630645316&single=true&output=csv'
-
-
-@st.cache
-def load_data(nrows):
-    data = pd.read_csv(DATA_URL, nrows=nrows)
-
-    def lowercase(x): return str(x).lower()
-    data.rename(lowercase, axis='columns', inplace=True)
-    for column in DATE_COLUMNS:
-    	data[column] = pd.to_datetime(data[column])
-    data['time_taken'] = data['end'] - data['start']
-    return data
-
-@st.cache
-def load_data2():
-    data2 = pd.read_csv("data_freetext.csv")
-    return data2
+from aggregates import QUESTIONS, counts, duration_bins, median_seconds
+from dataset import current, get
+from figures import memoized, stats
+from profiling import ENABLED as PROFILING, records, stage, start
+from schema import (AGE, CATEGORY_ORDERS, CHANGES, CONTACT, COUNTRY, EASE, EDUCATION, FIND, FREQUENCY, INTERNET,
+                    LANGUAGE, ONLINE_SERVICES, SERVICES, SERVICES_EASE, SHARING, SMARTPHONE)
 
 
 st.title('RSD Website Survey Analysis')
-st.header('Analysis of RSD website usability survey conducted in February 2021')
+# filled in once the data is loaded: the waves' names say when the survey ran
+heading = st.empty()
 # st.write('/$color{#FFCC00}{your-text-here}$')
 
+start('rerun')
 data_load_state = st.text('Loading data...')
-data = load_data(1200)
+# each session keeps the dataset version it started on, so reruns stay consistent while it is retained
+with stage('load'):
+    live = get(st.session_state.get('dataset_version'))
+    latest = current()
+if latest['version'] != live['version'] and st.button('Newer survey data is available, update the report'):
+    live = latest
+st.session_state['dataset_version'] = live['version']
 data_load_state.text('Loading data... done!')
-if st.checkbox('Show raw data'):
-    st.write('Sampled raw data')
-    st.write(data.sample(5))
-
-data2 = load_data2()
+st.caption('Data last changed %s UTC, checked for new submissions at %s UTC.' % (
+    live['updated_at'].strftime('%d %b %Y %H:%M'), live['checked_at'].strftime('%H:%M')))
+if live.get('error'):
+    st.caption('The latest refresh failed (%s); showing the last good data.' % live['error'])
+
+# with several survey waves registered the whole report can be narrowed to one of them;
+# 'All waves' adds their counts up
+ALL_WAVES = 'All waves'
+waves = live['waves']
+wave = ALL_WAVES
+if len(waves) > 1:
+    wave = st.selectbox('Survey wave', [ALL_WAVES] + list(waves))
+selected = live if wave == ALL_WAVES else waves[wave]
+names = list(waves) if wave == ALL_WAVES else [wave]
+heading.header('Analysis of RSD website usability survey conducted in %s' % (
+    names[0] if len(names) == 1 else '%s and %s' % (', '.join(names[:-1]), names[-1])))
+summary = selected['summary']
+
+@st.fragment
+def raw_data_section():
+    # served from a prebuilt artifact there are no respondent rows to show
+    if summary['sample'] is not None and st.checkbox('Show raw data'):
+        with stage('section:raw_data'):
+            st.write('Sampled raw data')
+            st.write(summary['sample'].sample(5))
+
+raw_data_section()
+
+data2 = selected['free_text']
 # st.write(data2)
 
-final_data = data[data['duplicated_contact'] == 0]
-duplicated_count = len(data) - len(final_data)
-final_respondents = len(final_data)
+duplicated_count = summary['respondents'] - summary['final_respondents']
+final_respondents = summary['final_respondents']
+cube = summary['cube']
 
 
 st.write("Initially, there were %d respondents, who participated in the survey, but %d respondents participated more than once. \
-Hence, the analysis will only consider %d respondents." % (len(data), duplicated_count, final_respondents))
+Hence, the analysis will only consider %d respondents." % (summary['respondents'], duplicated_count, final_respondents))
 # st.write(len(data))
 
 st.markdown('---')
 st.subheader('Average time taken to complete the survery')
-seconds = final_data.time_taken.median().total_seconds()
+seconds = median_seconds(summary['durations'])
 minutes = (seconds % 3600) // 60
 seconds = seconds % 60
 st.write('{:.0f} minutes, {:.0f} seconds'.format(minutes, seconds))
 
 template='simple_white'
-hist_data = final_data[final_data.time_taken.astype('timedelta64[s]')/60 < 50].time_taken.astype('timedelta64[s]')
+version = '%s/%s' % (live['version'], wave)
+
 
-# fig = px.histogram(x=hist_data.values, y=hist_data.index, template='simple_white', color='gender')
-fig = px.strip(final_data, x='time_taken', template=template, color='your current education level', log_x=True,)
-fig.update_xaxes(title_text='Time (in seconds) in logscale')
-fig.update_layout( legend_title="Education Level")
-st.write(fig)
+@memoized('time_taken')
+def time_taken_graph():
+    # respondents are binned server-side into log-spaced bins per education level, so the figure
+    # stays the same size however many responses there are
+    bins = duration_bins(summary['durations'])
+    fig = px.line(bins, x='seconds', y='count', template=template, color='your current education level', log_x=True, markers=True)
+    median = median_seconds(summary['durations'])
+    fig.add_vline(x=median, line_dash='dash')
+    # annotation positions on a log axis are given in log10 units, the line itself in data units
+    fig.add_annotation(x=np.log10(median), y=1, yref='paper', text='median', showarrow=False, xanchor='left', yanchor='bottom')
+    fig.update_xaxes(title_text='Time (in seconds) in logscale')
+    fig.update_yaxes(title_text='Respondents')
+    fig.update_layout( legend_title="Education Level")
+    return fig
+
+with stage('section:time_taken'):
+    st.write(time_taken_graph(version))
 
 
 st.markdown('---')
 st.subheader('Responses in timeseries')
 st.write('The survey ran for 34 days with an average of 30 respondents per day.')
-submission = final_data.groupby([final_data._submission_time.dt.date])._id.count()
-fig = px.line(x=submission.index, y=submission.values, template=template)
-fig.update_xaxes(title_text='Date')
-fig.update_yaxes(title_text='Respondents')
-st.write(fig)
+@memoized('daily')
+def daily_graph():
+    submission = summary['daily']
+    fig = px.line(x=submission.index, y=submission.values, template=template)
+    fig.update_xaxes(title_text='Date')
+    fig.update_yaxes(title_text='Respondents')
+    return fig
+
+with stage('section:daily'):
+    st.write(daily_graph(version))
 
 st.write('From 1:00 AM to 7:00 AM was relatively idle with an average of 18 respondents; otherwise the average response rate was 51 users per hour.')
-submission = final_data.groupby([final_data._submission_time.dt.hour])._id.count()
-fig = px.bar(x=submission.index, y=submission.values, template=template)
-fig.update_xaxes(title_text='Hour')
-fig.update_yaxes(title_text='Respondents')
-st.write(fig)
+@memoized('hourly')
+def hourly_graph():
+    submission = summary['hourly']
+    fig = px.bar(x=submission.index, y=submission.values, template=template)
+    fig.update_xaxes(title_text='Hour')
+    fig.update_yaxes(title_text='Respondents')
+    return fig
+
+with stage('section:hourly'):
+    st.write(hourly_graph(version))
 
 
 
@@ -88,304 +129,336 @@ st.markdown('---')
 st.subheader('How did you find the RSD website')
 st.markdown('Most of the users either accessed the RSD website through Google (and other search engines) or typed the URL directly. Around 9 per cent of the respondents landed on the RSD website through social media like Facebook, Twitter or Instagram.')
 
-def coo_graph(coo):
-    if coo == 'All the countries':
-        fig = px.histogram(final_data, x='how did you find our website today?', histfunc="sum", color="how did you find our website today?", category_orders={"how did you find our website today?":['I found you on Google (or another search engine)',
-       'I typed the website address (URL) in directly',
-       'Another UNHCR website', 'A link on Twitter / Facebook / Instagram',
-       'Other', 'A link from WhatsApp / Viber / Telegram',
-       'A link on another website']}, template=template)
-        fig.update_xaxes(title_text='How did you find RSD website today')
-        fig.update_yaxes(title_text='Respondents')
-        fig.update_layout( legend_title="How did you find RSD website today?")
-        st.write(fig)
-    else:
-        fig = px.histogram(final_data[final_data["what\'s your country of origin?"]==coo], x='how did you find our website today?', histfunc="sum", color="how did you find our website today?", category_orders={"how did you find our website today?":['I found you on Google (or another search engine)',
-       'I typed the website address (URL) in directly',
-       'Another UNHCR website', 'A link on Twitter / Facebook / Instagram',
-       'Other', 'A link from WhatsApp / Viber / Telegram',
-       'A link on another website']}, template=template)
-        fig.update_xaxes(title_text='How did you find RSD website today')
-        fig.update_yaxes(title_text='Respondents')
-        fig.update_layout( legend_title="How did you find RSD website today?")
-        st.write(fig)
-
-
-sort_country = list(final_data['what\'s your country of origin?'].unique())
-sort_country.append('All the countries')
-sort_country = sorted(sort_country)
-coo_to_filter = st.selectbox('Select nationality to find out how they accessed RSD site', sort_country)
-coo_graph(coo_to_filter)
+ALL_VALUES = ['All the countries', 'All age groups', 'All education groups']
 
 
+def filtered_counts(question, dimension, value):
+    if value in ALL_VALUES:
+        return counts(cube, question)
+    return counts(cube, question, dimension, value)
 
-st.markdown('---')
-st.subheader('Country of origin')
-st.write("35 per cent of the respondents were Sudanese, whereas Eritrean and South Sudanese were 16 and 14 per cent respectively.")
-fig = px.histogram(final_data, x="what's your country of origin?", histfunc="sum", template=template, color="what's your country of origin?", category_orders={"what's your country of origin?": ['Sudanese', 'Eritrean', 'South Sudanese', 'Syrian', 'Ethiopian', 'Somali', 'Iraqi', 'Yemeni', 'Other']})
-fig.update_layout(
-    legend_title="Country of Origin")
-fig.update_xaxes(title_text="Country of Origin")
-fig.update_yaxes(title_text="Respondents")
-st.write(fig)
 
+def count_bar(table, color=True):
+    # bar chart of a precomputed count table, equivalent to px.histogram(histfunc="sum") over the rows;
+    # the table comes out of the cube in the schema's category order, so no category_orders needed
+    # two filtered charts of one question are the same figure while both filters are unset, and
+    # Streamlit rejects identical charts, so such pairs are drawn with st.plotly_chart(key=...)
+    question = table.index.name
+    frame = table.rename('count').reset_index()
+    return px.bar(frame, x=question, y='count', color=question if color else None, template=template)
 
 
-
-st.markdown('---')
-st.subheader('What is your preferred language of communication?')
-st.markdown('Arabic is the most preferred language of communication among the Eritrean, Iraqi, South Sudanese, Sudanese, Syrian and Yemeni respondents. 30 per cent of the respondents preferred Somali, Tigrinya, Oromo, Amharic and other as the language of communication. Majority of these respondents were Eritreans, Ethiopians and Somalis.')
-
-def lng_graph(coo):
-    if coo == 'All the countries':
-        fig = px.histogram(final_data,x='what is your preferred language of communication?', histfunc="sum", template=template)
-        fig.update_xaxes(title_text='What is your preferred language of commuication?')
-        fig.update_yaxes(title_text='Respondents')
-        fig.update_layout( legend_title="What is your preferred language of commuication?")
-        st.write(fig)
-    else:
-        fig = px.histogram(final_data[final_data["what\'s your country of origin?"]==coo],x='what is your preferred language of communication?', histfunc="sum", template=template)
-        fig.update_xaxes(title_text='What is your preferred language of commuication?')
-        fig.update_yaxes(title_text='Respondents')
-        fig.update_layout( legend_title="What is your preferred language of commuication?")
-        st.write(fig)
-
-lng_country=sort_country 
-lng_to_filter = st.selectbox('Select nationality to find out their language preference', lng_country)
-lng_graph(lng_to_filter)
+def free_text_table(question):
+    # answers to the open-ended questions, coded into categories (free_text.py)
+    return data2[data2.question == question]
 
 
-st.markdown('---')
-st.subheader('How easy is RSD website to use? ')
-st.markdown("Most respondents find RSD site Very Easy or Easy to use. The reponse remains same among all the age groups.")
-def easy_graph(age):
-    if age == 'All age groups':
-        fig = px.histogram(final_data,x='how easy is our website to use?', histfunc="sum", template=template, color='how easy is our website to use?', category_orders={'how easy is our website to use?':['Very easy', 'Easy', 'Neither easy nor difficult', 'Difficult', 'Very difficult']})
-        fig.update_xaxes(title_text='How easy is RSD website to use? ')
-        fig.update_yaxes(title_text='Respondents')
-        fig.update_layout( legend_title="How easy is RSD website to use? ")
-        st.write(fig)
-    else:
-        fig = px.histogram(final_data[final_data['your age'] == age],x='how easy is our website to use?', histfunc="sum", template=template, color='how easy is our website to use?', category_orders={'how easy is our website to use?':['Very easy', 'Easy', 'Neither easy nor difficult', 'Difficult', 'Very difficult']})
-        fig.update_xaxes(title_text='How easy is RSD website to use? ')
-        fig.update_yaxes(title_text='Respondents')
-        fig.update_layout( legend_title="How easy is RSD website to use? ")
-        st.write(fig)
-
-sort_agegp = ['All age groups', 'Under 18', '18-24', '25-34', '35-44', '45-54', '55-64', '65+']
-age_to_filter = st.selectbox('Select age group to find out how easy it to use RSD website', sort_agegp)
-easy_graph(age_to_filter)
-
-
-
-st.markdown("Respondents with **No formal education** and **Elementary school** equally found the website *Neither easy nor difficult to use*")
-def easy_graph(education):
-    if education == 'All education groups':
-        fig = px.histogram(final_data,x='how easy is our website to use?', histfunc="sum", template=template, color='how easy is our website to use?', category_orders={'how easy is our website to use?':['Very easy', 'Easy', 'Neither easy nor difficult', 'Difficult', 'Very difficult']})
-        fig.update_xaxes(title_text='How easy is RSD website to use? ')
-        fig.update_yaxes(title_text='Respondents')
-        fig.update_layout( legend_title="How easy is RSD website to use? ")
-        st.write(fig)
-    else:
-        fig = px.histogram(final_data[final_data['your current education level'] == education],x='how easy is our website to use?', histfunc="sum", template=template, color='how easy is our website to use?', category_orders={'how easy is our website to use?':['Very easy', 'Easy', 'Neither easy nor difficult', 'Difficult', 'Very difficult']})
-        fig.update_xaxes(title_text='How easy is RSD website to use? ')
-        fig.update_yaxes(title_text='Respondents')
-        fig.update_layout( legend_title="How easy is RSD website to use? ")
-        st.write(fig)
-
-sort_education = ['All education groups', 'No formal education', 'Elementary school','High school / college', "Bachelor's degree / technical college",  'Masters degree', 'PhD' ]
-education_to_filter = st.selectbox('Select education group to find out how easy it to use RSD website', sort_education)
-easy_graph(education_to_filter)
+@memoized('coo')
+def coo_graph(coo):
+    fig = count_bar(filtered_counts(FIND, COUNTRY, coo))
+    fig.update_xaxes(title_text='How did you find RSD website today')
+    fig.update_yaxes(title_text='Respondents')
+    fig.update_layout( legend_title="How did you find RSD website today?")
+    return fig
 
 
-st.markdown('---')
-st.subheader('How often do you use our website?')
-st.markdown('Most of the respondents visited the site on a daily, weekly or monthly basis.')
-def visit_graph(education):
-    if education == 'All education groups':
-        fig = px.histogram(final_data[final_data['how often do you use our website?'].notnull()],x='how often do you use our website?', histfunc="sum", template=template, color='how often do you use our website?', category_orders={'how often do you use our website?':['Often (daily)', 'Regularly (weekly)', 'Sometimes (monthly)', 'Rarely (every few months)', 'This is the first time']})
-        fig.update_xaxes(title_text='How often do you use our website?')
-        fig.update_yaxes(title_text='Respondents')
-        fig.update_layout( legend_title="How often do you use our website?")
-        st.write(fig)
-    else:
-        fig = px.histogram(final_data[final_data['your current education level'] == education],x='how often do you use our website?', histfunc="sum", template=template, color='how often do you use our website?', category_orders={'how often do you use our website?':['Often (daily)',  'Regularly (weekly)', 'Sometimes (monthly)', 'Rarely (every few months)', 'This is the first time']})
-        fig.update_xaxes(title_text='How often do you use our website?')
-        fig.update_yaxes(title_text='Respondents')
-        fig.update_layout( legend_title="How often do you use our website?")
-        st.write(fig)
-
-sort_education = ['All education groups', 'No formal education', 'Elementary school','High school / college', "Bachelor's degree / technical college", 'Masters degree', 'PhD']
-education_to_filter = st.selectbox('Select education group to find out how often they visit the site', sort_education)
-visit_graph(education_to_filter)
-
-
-st.markdown('21 per cent of the total respondents had visited the site for the first time. Most of these respondents were from Sudan, Syria and South Sudan.')
-def visit_coo_graph(coo):
-    if coo == 'All the countries':
-        fig = px.histogram(final_data,x='how often do you use our website?', histfunc="sum", template=template, color='how often do you use our website?', category_orders={'how often do you use our website?':['Often (daily)', 'Regularly (weekly)', 'Sometimes (monthly)', 'Rarely (every few months)', 'This is the first time']})
-        fig.update_xaxes(title_text='How often do you use our website?')
-        fig.update_yaxes(title_text='Respondents')
-        fig.update_layout( legend_title="How often do you use our website?")
-        st.write(fig)
-    else:
-        fig = px.histogram(final_data[final_data["what\'s your country of origin?"]==coo],x='how often do you use our website?', histfunc="sum", template=template, color='how often do you use our website?', category_orders={'how often do you use our website?':['Often (daily)',  'Regularly (weekly)', 'Sometimes (monthly)', 'Rarely (every few months)', 'This is the first time']})
-        fig.update_xaxes(title_text='How often do you use our website?')
-        fig.update_yaxes(title_text='Respondents')
-        fig.update_layout( legend_title="How often do you use our website?")
-        st.write(fig)
+sort_country = list(counts(cube, COUNTRY).index)
+sort_country.append('All the countries')
+sort_country = sorted(sort_country)
 
 
-sort_visit_coo = sort_country 
-visit_coo_to_filter = st.selectbox('Select nationality to find out how often they visit the site', sort_visit_coo)
-visit_coo_graph(visit_coo_to_filter)
+# Each interactive section is a fragment, so changing its selectbox reruns only that section.
+@st.fragment
+def coo_section():
+    coo_to_filter = st.selectbox('Select nationality to find out how they accessed RSD site', sort_country)
+    with stage('section:coo', filter=coo_to_filter):
+        st.write(coo_graph(version, coo_to_filter))
 
+coo_section()
 
-st.markdown('---')
-st.subheader("Is there anything you would change or remove to make the website easier to use and/or is anything missing, perhaps a topic you would like to know more about?")
-st.markdown('')
-piedata = data2[data2.question == "Is there anything you would change or remove to make the help website easier to use and/or is anything missing, perhaps a topic you would like to know more about?"]
-fig = px.pie(piedata, names='response', values='count', template=template)
-st.write(fig)
-st.markdown("Answering to specific suggestions related to RSD, respondents suggested the following (listed according to popularity of the reply/topic):")
-st.markdown("* Add the RSD result of First Instance and Appeal")
-st.markdown("* Add a live chat box for applicants to be able to communicate with staff / add an interactive section like Facebook comments to the website")
-st.markdown("* Update the RSD website on a regular basis and include most recent information relating to refugees and asylum-seekers")
-st.markdown("* Add a complaint box/ feedback mechanism on the website")
-st.markdown("* Provide more details about the case status on the website")
-st.markdown(
-    "* Add google maps address to the website with the location of the Office")
-st.markdown(
-    "* Make other languages easier to use and accessible throughout the website")
-st.markdown("* Reflect the changed phone numbers faster on the website")
-st.markdown(
-    "* Add the method in which the RSD interview will be conducted (Signal/Phone/ Office)")
-st.markdown("* Change the font, colors and front page of the RSD website")
 
-st.markdown('---')
-st.subheader('Do you have your own smartphone')
-st.markdown('Majority of the respondents had their own smartphones - mostly Android. 90 per cent either owned smartphone or shared smartphone with their family or friends. 10 per cent of the respondents do not have their own smartphone. ')
-def coo_smart_graph(coo):
-    if coo == 'All the countries':
-        piegraph_data = final_data.groupby('do you have your own smartphone?')['_id'].count()
-        fig = px.pie(piegraph_data, values=piegraph_data.values, names=piegraph_data.index, template=template, color_discrete_map={'I have an Android smartphone': '#2ba02b', "I don't have access to a smartphone": '#d62827', 'I have an Apple/iOS smartphone': '#545c84', 'I share an Android smartphone with my family or friends' : '#7dc388', 'I share an Apple/iOS smartphone with my family or friends': '#808c9d'})
-        st.write(fig)
-    else:
-        piegraph_data = final_data[final_data["what\'s your country of origin?"]==coo].groupby('do you have your own smartphone?')['_id'].count()
-        fig = px.pie(piegraph_data, values=piegraph_data.values, names=piegraph_data.index, template=template, color_discrete_map={'I have an Android smartphone': '#2ba02b', "I don't have access to a smartphone": '#d62827', 'I have an Apple/iOS smartphone': '#545c84', 'I share an Android smartphone with my family or friends' : '#7dc388', 'I share an Apple/iOS smartphone with my family or friends': '#808c9d'})
-        st.write(fig)
-sort_visit_coo = sort_country 
-visit_coo_to_filter = st.selectbox('Select nationality to find out whether they have their own smartphone', sort_visit_coo)
-coo_smart_graph(visit_coo_to_filter)
+# Sections below the fold sit in collapsed expanders and only run once opened; opening one
+# reruns just its own fragment.
+@st.fragment
+def lazy_section(title, key, render):
+    with st.expander(title, key=key, on_change='rerun') as expander:
+        if expander.open:
+            with stage('section:' + key):
+                render()
 
 
-st.markdown('---')
-st.subheader('Do you have access to the internet vs owning smartphone')
-st.markdown('60 per cent of the respondents had access to the internet and 40 per cent did not.')
-sanky_graph = final_data.groupby(['do you always have access to the internet?','do you have your own smartphone?'])['_id'].count().to_frame().reset_index()
-sanky_graph.columns=['Do you have access to the internet?', 'target', 'value']
-# fig = px.sunburst(sanky_graph, path=[
-#     'Have access to the internet', 'target'], values='value', width=800, height=600, template=template)
-# st.write(fig)
-fig = px.treemap(sanky_graph, path=[px.Constant('Do you have access to the internet?'), 'Do you have access to the internet?', 'target'], values='value',
-                 color='value', hover_data=['Do you have access to the internet?'], template=template)
-st.write(fig)
+@memoized('country')
+def country_graph():
+    fig = count_bar(counts(cube, COUNTRY))
+    fig.update_layout(
+        legend_title="Country of Origin")
+    fig.update_xaxes(title_text="Country of Origin")
+    fig.update_yaxes(title_text="Respondents")
+    return fig
 
+def country_section():
+    st.write("35 per cent of the respondents were Sudanese, whereas Eritrean and South Sudanese were 16 and 14 per cent respectively.")
+    st.write(country_graph(version))
 
 st.markdown('---')
-st.subheader(
-    "What UNHCR services would you like to be able to access digitally / online?")
-st.markdown('')
-piedata = data2[data2.question ==
-                "What UNHCR services would you like to be able to access digitally / online?"]
-fig = px.pie(piedata, names='response', values='count', template=template)
-st.write(fig)
-st.markdown("19.4 per cent of respondents who mentioned RSD further noted that they would like to:") 
-st.markdown("* Access RSD result")
-st.markdown("* Inquire about RSD status / case status")
-st.markdown("* RSD interview date")
-st.markdown("* Process reopening via the website")
+lazy_section('Country of origin', 'country', country_section)
 
 
-st.markdown('---')
-st.subheader('Do you use any online services')
-st.markdown('On an average only 11 to 12 per cent of the respondents used other online services from other organisations.')
-
-
-def coo_smart_graph(coo):
-    if coo == 'All the countries':
-        piegraph_data = final_data.groupby(
-            'do you use any online services from other organisations such as the government, banks, other organisations like unhcr?')['_id'].count()
-        fig = px.pie(piegraph_data, values=piegraph_data.values,
-                     names=piegraph_data.index, template=template, color=piegraph_data.index,  color_discrete_map={'Yes': 'royalblue', "No": '#d62827'})
-        st.write(fig)
-      
-    else:
-        piegraph_data = final_data[final_data["what\'s your country of origin?"] == coo].groupby(
-            'do you use any online services from other organisations such as the government, banks, other organisations like unhcr?')['_id'].count()
-        fig = px.pie(piegraph_data, values=piegraph_data.values,
-                     names=piegraph_data.index, template=template, color=piegraph_data.index, color_discrete_map={'Yes': 'royalblue', 'No': '#d62827'})
-        st.write(fig)
-
-
-sort_online_coo = sort_country
-online_coo_to_filter = st.selectbox(
-    'Select nationality to find out whether they access other online services', sort_online_coo)
-coo_smart_graph(online_coo_to_filter)
-
-
-
-
-st.subheader("How do you feel about sharing your personal information such as your name, biometric data or other identity documents and details to help identify you for access to UNHCR's services online?")
-bardata = data2[data2.question == "How do you feel about sharing your personal information such as your name, biometric data or other identity documents and details to help identify you for access to UNHCR's services online?"]
-# st.write(bardata)
-fig = px.bar(bardata, x="response", y="count", template=template)
-fig.update_xaxes(title_text="Response")
-fig.update_yaxes(title_text="Respondants")
-st.write(fig)
-st.write("Most respondents said they were fine with sharing personal information. Those who raised their concern mentioned that:")
-st.markdown("* Data is not safe on the internet")
-st.markdown("* Data will be shared with a third party provider without the Applicant's consent")
-st.markdown("* Data will be shared with the government (of Egypt and/or of the POCs' government)")
-
-
-st.subheader("Do you find these services easy to use? Please explain.")
-bardata = data2[data2.question ==
-                "Do you find these services easy to use? Please explain. "]
-# st.write(bardata)
-fig = px.bar(bardata, x="response", y="count", template=template)
-fig.update_xaxes(title_text="Response")
-fig.update_yaxes(title_text="Respondants")
-st.write(fig)
-st.markdown("Respondants who answered **No** also added following concerns:") 
-st.markdown("* Lack of education including inability to read/ write and/or use technology hinders access")
-st.markdown("* Not easy for older individuals with less technological awareness")
-st.markdown("* No access to internet/smart phone")
-st.markdown("* Afraid of being hacked / internet usage for personal information")
-st.markdown("* There is a language barrier") 
+@memoized('language')
+def lng_graph(coo):
+    fig = count_bar(filtered_counts(LANGUAGE, COUNTRY, coo), color=False)
+    fig.update_xaxes(title_text='What is your preferred language of commuication?')
+    fig.update_yaxes(title_text='Respondents')
+    fig.update_layout( legend_title="What is your preferred language of commuication?")
+    return fig
+
+def lng_section():
+    st.markdown('Arabic is the most preferred language of communication among the Eritrean, Iraqi, South Sudanese, Sudanese, Syrian and Yemeni respondents. 30 per cent of the respondents preferred Somali, Tigrinya, Oromo, Amharic and other as the language of communication. Majority of these respondents were Eritreans, Ethiopians and Somalis.')
+    lng_country=sort_country
+    lng_to_filter = st.selectbox('Select nationality to find out their language preference', lng_country)
+    st.write(lng_graph(version, lng_to_filter))
+
+lazy_section('What is your preferred language of communication?', 'language', lng_section)
+
+
+@memoized('ease_by_age')
+def easy_age_graph(age):
+    fig = count_bar(filtered_counts(EASE, AGE, age))
+    fig.update_xaxes(title_text='How easy is RSD website to use? ')
+    fig.update_yaxes(title_text='Respondents')
+    fig.update_layout( legend_title="How easy is RSD website to use? ")
+    return fig
+
+@memoized('ease_by_education')
+def easy_education_graph(education):
+    fig = count_bar(filtered_counts(EASE, EDUCATION, education))
+    fig.update_xaxes(title_text='How easy is RSD website to use? ')
+    fig.update_yaxes(title_text='Respondents')
+    fig.update_layout( legend_title="How easy is RSD website to use? ")
+    return fig
+
+def easy_section():
+    st.markdown("Most respondents find RSD site Very Easy or Easy to use. The reponse remains same among all the age groups.")
+    sort_agegp = ['All age groups'] + CATEGORY_ORDERS[AGE]
+    age_to_filter = st.selectbox('Select age group to find out how easy it to use RSD website', sort_agegp)
+    st.plotly_chart(easy_age_graph(version, age_to_filter), key='ease_by_age')
+
+    st.markdown("Respondents with **No formal education** and **Elementary school** equally found the website *Neither easy nor difficult to use*")
+    sort_education = ['All education groups'] + CATEGORY_ORDERS[EDUCATION]
+    education_to_filter = st.selectbox('Select education group to find out how easy it to use RSD website', sort_education)
+    st.plotly_chart(easy_education_graph(version, education_to_filter), key='ease_by_education')
+
+lazy_section('How easy is RSD website to use?', 'ease', easy_section)
+
+
+@memoized('visits_by_education')
+def visit_graph(education):
+    fig = count_bar(filtered_counts(FREQUENCY, EDUCATION, education))
+    fig.update_xaxes(title_text='How often do you use our website?')
+    fig.update_yaxes(title_text='Respondents')
+    fig.update_layout( legend_title="How often do you use our website?")
+    return fig
 
+@memoized('visits_by_country')
+def visit_coo_graph(coo):
+    fig = count_bar(filtered_counts(FREQUENCY, COUNTRY, coo))
+    fig.update_xaxes(title_text='How often do you use our website?')
+    fig.update_yaxes(title_text='Respondents')
+    fig.update_layout( legend_title="How often do you use our website?")
+    return fig
+
+def visit_section():
+    st.markdown('Most of the respondents visited the site on a daily, weekly or monthly basis.')
+    sort_education = ['All education groups'] + CATEGORY_ORDERS[EDUCATION]
+    education_to_filter = st.selectbox('Select education group to find out how often they visit the site', sort_education)
+    st.plotly_chart(visit_graph(version, education_to_filter), key='visits_by_education')
+
+    st.markdown('21 per cent of the total respondents had visited the site for the first time. Most of these respondents were from Sudan, Syria and South Sudan.')
+    sort_visit_coo = sort_country
+    visit_coo_to_filter = st.selectbox('Select nationality to find out how often they visit the site', sort_visit_coo)
+    st.plotly_chart(visit_coo_graph(version, visit_coo_to_filter), key='visits_by_country')
+
+lazy_section('How often do you use our website?', 'frequency', visit_section)
+
+
+@memoized('changes')
+def changes_graph():
+    piedata = free_text_table(CHANGES)
+    return px.pie(piedata, names='response', values='count', template=template)
+
+def changes_section():
+    st.write(changes_graph(version))
+    st.markdown("Answering to specific suggestions related to RSD, respondents suggested the following (listed according to popularity of the reply/topic):")
+    st.markdown("* Add the RSD result of First Instance and Appeal")
+    st.markdown("* Add a live chat box for applicants to be able to communicate with staff / add an interactive section like Facebook comments to the website")
+    st.markdown("* Update the RSD website on a regular basis and include most recent information relating to refugees and asylum-seekers")
+    st.markdown("* Add a complaint box/ feedback mechanism on the website")
+    st.markdown("* Provide more details about the case status on the website")
+    st.markdown(
+        "* Add google maps address to the website with the location of the Office")
+    st.markdown(
+        "* Make other languages easier to use and accessible throughout the website")
+    st.markdown("* Reflect the changed phone numbers faster on the website")
+    st.markdown(
+        "* Add the method in which the RSD interview will be conducted (Signal/Phone/ Office)")
+    st.markdown("* Change the font, colors and front page of the RSD website")
+
+lazy_section("Is there anything you would change or remove to make the website easier to use and/or is anything missing, perhaps a topic you would like to know more about?", 'changes', changes_section)
+
+
+@memoized('smartphone')
+def smart_graph(coo):
+    piegraph_data = filtered_counts(SMARTPHONE, COUNTRY, coo)
+    fig = px.pie(piegraph_data, values=piegraph_data.values, names=piegraph_data.index, template=template, color_discrete_map={'I have an Android smartphone': '#2ba02b', "I don't have access to a smartphone": '#d62827', 'I have an Apple/iOS smartphone': '#545c84', 'I share an Android smartphone with my family or friends' : '#7dc388', 'I share an Apple/iOS smartphone with my family or friends': '#808c9d'})
+    return fig
+
+def smart_section():
+    st.markdown('Majority of the respondents had their own smartphones - mostly Android. 90 per cent either owned smartphone or shared smartphone with their family or friends. 10 per cent of the respondents do not have their own smartphone. ')
+    sort_visit_coo = sort_country
+    visit_coo_to_filter = st.selectbox('Select nationality to find out whether they have their own smartphone', sort_visit_coo)
+    st.write(smart_graph(version, visit_coo_to_filter))
+
+lazy_section('Do you have your own smartphone', 'smartphone', smart_section)
+
+
+@memoized('internet_smartphone')
+def internet_graph():
+    sanky_graph = cube[INTERNET, SMARTPHONE].to_frame().reset_index()
+    sanky_graph.columns=['Do you have access to the internet?', 'target', 'value']
+    # fig = px.sunburst(sanky_graph, path=[
+    #     'Have access to the internet', 'target'], values='value', width=800, height=600, template=template)
+    # st.write(fig)
+    fig = px.treemap(sanky_graph, path=[px.Constant('Do you have access to the internet?'), 'Do you have access to the internet?', 'target'], values='value',
+                     color='value', hover_data=['Do you have access to the internet?'], template=template)
+    return fig
+
+def internet_section():
+    st.markdown('60 per cent of the respondents had access to the internet and 40 per cent did not.')
+    st.write(internet_graph(version))
+
+lazy_section('Do you have access to the internet vs owning smartphone', 'internet', internet_section)
+
+
+@memoized('services')
+def services_graph():
+    piedata = free_text_table(SERVICES)
+    return px.pie(piedata, names='response', values='count', template=template)
+
+def services_section():
+    st.write(services_graph(version))
+    st.markdown("19.4 per cent of respondents who mentioned RSD further noted that they would like to:")
+    st.markdown("* Access RSD result")
+    st.markdown("* Inquire about RSD status / case status")
+    st.markdown("* RSD interview date")
+    st.markdown("* Process reopening via the website")
+
+lazy_section("What UNHCR services would you like to be able to access digitally / online?", 'services', services_section)
+
+
+@memoized('online_services')
+def online_graph(coo):
+    piegraph_data = filtered_counts(ONLINE_SERVICES, COUNTRY, coo)
+    fig = px.pie(piegraph_data, values=piegraph_data.values,
+                 names=piegraph_data.index, template=template, color=piegraph_data.index, color_discrete_map={'Yes': 'royalblue', 'No': '#d62827'})
+    return fig
+
+@memoized('sharing')
+def sharing_graph():
+    bardata = free_text_table(SHARING)
+    # st.write(bardata)
+    fig = px.bar(bardata, x="response", y="count", template=template)
+    fig.update_xaxes(title_text="Response")
+    fig.update_yaxes(title_text="Respondants")
+    return fig
+
+@memoized('services_ease')
+def services_ease_graph():
+    bardata = free_text_table(SERVICES_EASE)
+    # st.write(bardata)
+    fig = px.bar(bardata, x="response", y="count", template=template)
+    fig.update_xaxes(title_text="Response")
+    fig.update_yaxes(title_text="Respondants")
+    return fig
+
+def online_section():
+    st.markdown('On an average only 11 to 12 per cent of the respondents used other online services from other organisations.')
+    sort_online_coo = sort_country
+    online_coo_to_filter = st.selectbox(
+        'Select nationality to find out whether they access other online services', sort_online_coo)
+    st.write(online_graph(version, online_coo_to_filter))
+
+    st.subheader("How do you feel about sharing your personal information such as your name, biometric data or other identity documents and details to help identify you for access to UNHCR's services online?")
+    st.write(sharing_graph(version))
+    st.write("Most respondents said they were fine with sharing personal information. Those who raised their concern mentioned that:")
+    st.markdown("* Data is not safe on the internet")
+    st.markdown("* Data will be shared with a third party provider without the Applicant's consent")
+    st.markdown("* Data will be shared with the government (of Egypt and/or of the POCs' government)")
+
+    st.subheader("Do you find these services easy to use? Please explain.")
+    st.write(services_ease_graph(version))
+    st.markdown("Respondants who answered **No** also added following concerns:")
+    st.markdown("* Lack of education including inability to read/ write and/or use technology hinders access")
+    st.markdown("* Not easy for older individuals with less technological awareness")
+    st.markdown("* No access to internet/smart phone")
+    st.markdown("* Afraid of being hacked / internet usage for personal information")
+    st.markdown("* There is a language barrier")
+
+lazy_section('Do you use any online services', 'online_services', online_section)
+
+
+@memoized('contact')
+def contact_graph(coo):
+    piegraph_data = filtered_counts(CONTACT, COUNTRY, coo)
+    fig = px.pie(piegraph_data, values=piegraph_data.values,
+                 names=piegraph_data.index, template=template, color=piegraph_data.index, color_discrete_map={'Yes': 'royalblue', 'No': '#d62827'})
+    return fig
+
+def contact_section():
+    sort_online_coo = sort_country
+    online_coo_to_filter = st.selectbox(
+        'Select nationality to find out whether they would like get contacted in the future', sort_online_coo)
+    st.write(contact_graph(version, online_coo_to_filter))
+
+lazy_section("Can we contact you again?", 'contact', contact_section)
+
+
+@memoized('wave_comparison')
+def wave_graph(question):
+    # answers as a share of each wave's respondents, since waves differ in size
+    frames = []
+    for name, state in waves.items():
+        table = counts(state['summary']['cube'], question)
+        frames.append(pd.DataFrame({question: table.index.astype(str), 'share': table.values / max(table.sum(), 1) * 100,
+                                    'wave': name}))
+    order = [str(answer) for answer in counts(live['summary']['cube'], question).index]
+    fig = px.bar(pd.concat(frames, ignore_index=True), x=question, y='share', color='wave', barmode='group',
+                 category_orders={question: order}, template=template)
+    fig.update_xaxes(title_text=question[0].upper() + question[1:])
+    fig.update_yaxes(title_text='Per cent of respondents')
+    fig.update_layout(legend_title='Survey wave')
+    return fig
+
+def wave_section():
+    question = st.selectbox('Select a question to compare across survey waves', QUESTIONS,
+                            format_func=lambda q: q[0].upper() + q[1:])
+    st.write(wave_graph(live['version'], question))
+
+if len(waves) > 1:
+    lazy_section('Compare survey waves', 'waves', wave_section)
 st.markdown("---")
-st.subheader("Can we contact you again?")
 
 
-def coo_smart_graph(coo):
-    if coo == 'All the countries':
-        piegraph_data = final_data.groupby(
-            'can we contact you again in future to help us improve our digital services?')['_id'].count()
-        fig = px.pie(piegraph_data, values=piegraph_data.values,
-                     names=piegraph_data.index, template=template, color=piegraph_data.index,  color_discrete_map={'Yes': 'royalblue', "No": '#d62827'})
-        st.write(fig)
-
-    else:
-        piegraph_data = final_data[final_data["what\'s your country of origin?"] == coo].groupby(
-            'can we contact you again in future to help us improve our digital services?')['_id'].count()
-        fig = px.pie(piegraph_data, values=piegraph_data.values,
-                     names=piegraph_data.index, template=template, color=piegraph_data.index, color_discrete_map={'Yes': 'royalblue', 'No': '#d62827'})
-        st.write(fig)
-
-
-sort_online_coo = sort_country
-online_coo_to_filter = st.selectbox(
-    'Select nationality to find out whether they would like get contacted in the future', sort_online_coo)
-coo_smart_graph(online_coo_to_filter)
-st.markdown("---")
+def profiling_panel():
+    # SURVEY_PROFILE only: this rerun's sections, the build that produced the data on screen, and
+    # the figure cache. Fragment-only reruns are logged but do not redraw the panel.
+    if not st.sidebar.checkbox('Show profiling breakdown'):
+        return
+    st.sidebar.subheader('This rerun')
+    st.sidebar.dataframe(pd.DataFrame(records()).drop(columns=['run', 'kind'], errors='ignore'), hide_index=True)
+    st.sidebar.subheader('Dataset build')
+    st.sidebar.dataframe(pd.DataFrame(live.get('profile', [])).drop(columns=['run'], errors='ignore'), hide_index=True)
+    st.sidebar.subheader('Figure cache')
+    st.sidebar.json(stats())
+
+if PROFILING:
+    profiling_panel()
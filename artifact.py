@@ -0,0 +1,122 @@
+"""Precompute every aggregate the report shows into a static artifact.
+
+    python artifact.py build/                # fetch every wave once, write build/waves.json + one directory per wave
+    SURVEY_ARTIFACT=build/ streamlit run app.py
+
+The artifact holds count tables only (crosstab marginals, submissions per day/hour, completion
+times per second and education level, the free-text table); no respondent-level rows are
+written, so the raw data section is hidden when serving from it.
+"""
+import argparse
+import datetime
+import json
+import os
+import re
+
+import pandas as pd
+
+from schema import SCHEMA_VERSION
+from survey_data import write_atomic, write_json
+
+
+MANIFEST = 'manifest.json'
+# the wave registry of an artifact: [{"name": ..., "artifact": <directory relative to it>}, ...]
+WAVES = 'waves.json'
+# summary entries written as one table each; the cube is written per key
+TABLES = ['daily', 'hourly', 'durations']
+
+
+def write_table(directory, name, table):
+    # Series come back with their index (and ordered categoricals) from the column names alone
+    frame = table.rename('count').reset_index() if isinstance(table, pd.Series) else table
+    write_atomic(os.path.join(directory, name), frame.to_parquet)
+    return name
+
+
+def read_table(directory, name, series=True):
+    frame = pd.read_parquet(os.path.join(directory, name))
+    return frame.set_index(list(frame.columns[:-1]))['count'] if series else frame
+
+
+def manifest_files(manifest):
+    return {manifest['free_text'], *manifest['tables'].values(), *(name for _, name in manifest['cube'])}
+
+
+def write_artifact(state, directory):
+    # Table files carry the version in their name and the manifest is replaced last, so a serving
+    # process polling the directory never sees a half-written artifact. The tables of the previous
+    # manifest are kept for one more build: a server that read that manifest just before it was
+    # replaced can still load them. Only files neither manifest refers to are removed.
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, MANIFEST)
+    keep = set()
+    if os.path.exists(path):
+        with open(path) as f:
+            keep = manifest_files(json.load(f))
+    summary, prefix = state['summary'], state['version']
+    manifest = {
+        'version': state['version'],
+        'schema_version': SCHEMA_VERSION,
+        'updated_at': state['updated_at'].isoformat(),
+        'built_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'respondents': int(summary['respondents']),
+        'final_respondents': int(summary['final_respondents']),
+        'tables': {name: write_table(directory, '%s.%s.parquet' % (prefix, name), summary[name]) for name in TABLES},
+        'free_text': write_table(directory, '%s.free_text.parquet' % prefix, state['free_text']),
+        'cube': [[list(key), write_table(directory, '%s.cube.%d.parquet' % (prefix, i), table)]
+                 for i, (key, table) in enumerate(summary['cube'].items())],
+    }
+    write_atomic(path, lambda p: write_json(p, manifest))
+    keep |= manifest_files(manifest)
+    for name in os.listdir(directory):
+        if name.endswith('.parquet') and name not in keep:
+            os.remove(os.path.join(directory, name))
+    return manifest
+
+
+def read_artifact(directory, previous=None):
+    # A dataset state (see dataset.build) backed only by the artifact; while the manifest has not
+    # changed, the previous state's tables are reused. This read succeeded, so an error recorded
+    # by a failed refresh in between is not carried over.
+    path = os.path.join(directory, MANIFEST)
+    modified = os.path.getmtime(path)
+    if previous is not None and previous.get('artifact_modified') == modified:
+        state = dict(previous)
+        state.pop('error', None)
+        return state
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest['schema_version'] != SCHEMA_VERSION:
+        raise ValueError('artifact %s was built for schema %s, this app expects %s'
+                         % (directory, manifest['schema_version'], SCHEMA_VERSION))
+    summary = {name: read_table(directory, file) for name, file in manifest['tables'].items()}
+    summary.update(respondents=manifest['respondents'], final_respondents=manifest['final_respondents'],
+                   cube={tuple(key): read_table(directory, file) for key, file in manifest['cube']},
+                   sample=None, version=manifest['version'])
+    free_text = read_table(directory, manifest['free_text'], series=False)
+    return {'free_text': free_text, 'data': None, 'summary': summary,
+            'updated_at': datetime.datetime.fromisoformat(manifest['updated_at']),
+            'version': manifest['version'], 'artifact_modified': modified,
+            'frames': {id(free_text): int(free_text.memory_usage(deep=True).sum())}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('directory', help='where to write manifest.json and the count tables')
+    args = parser.parse_args()
+
+    # dataset reads artifacts in serving mode, so it is imported here rather than at the top
+    from dataset import refresh
+    waves = []
+    for name, state in refresh()['waves'].items():
+        directory = re.sub('[^a-z0-9]+', '-', name.lower()).strip('-') or 'wave-%d' % len(waves)
+        manifest = write_artifact(state, os.path.join(args.directory, directory))
+        waves.append({'name': name, 'artifact': directory})
+        print('wrote %s (version %s, %d respondents, %d tables)' % (
+            os.path.join(args.directory, directory), manifest['version'], manifest['respondents'],
+            len(manifest['cube']) + len(TABLES) + 1))
+    write_atomic(os.path.join(args.directory, WAVES), lambda p: write_json(p, waves))
+
+
+if __name__ == '__main__':
+    main()
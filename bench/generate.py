@@ -0,0 +1,160 @@
+"""Synthetic survey exports shaped like the real one, for benchmarking app.py.
+
+    python bench/generate.py 100000 /tmp/survey_100k.csv
+
+Writes the export plus a matching free-text table next to it (``<name>_freetext.csv``).
+Answer shares follow the figures quoted in the report; free-text answers are drawn from
+phrases like the ones respondents actually wrote. Like the real export, rows also carry long
+free-text columns the report never reads (``--no-filler`` leaves them out), so parsing cost,
+payload size and the effect of projecting them away at read time are realistic.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from schema import (AGE, CATEGORY_ORDERS, CONTACT, COUNTRY, EASE, EDUCATION, FIND, FREQUENCY, INTERNET,  # noqa: E402
+                    LANGUAGE, ONLINE_SERVICES, SMARTPHONE)
+
+
+WEIGHTS = {
+    FIND: [0.45, 0.3, 0.08, 0.09, 0.05, 0.02, 0.01],
+    COUNTRY: [0.35, 0.16, 0.14, 0.1, 0.09, 0.06, 0.03, 0.03, 0.04],
+    EASE: [0.4, 0.35, 0.15, 0.06, 0.04],
+    AGE: [0.03, 0.2, 0.38, 0.24, 0.1, 0.04, 0.01],
+    EDUCATION: [0.08, 0.12, 0.4, 0.3, 0.08, 0.02],
+    FREQUENCY: [0.2, 0.25, 0.2, 0.14, 0.21],
+    SMARTPHONE: [0.6, 0.1, 0.15, 0.05, 0.1],
+    INTERNET: [0.6, 0.4],
+    ONLINE_SERVICES: [0.12, 0.88],
+    CONTACT: [0.8, 0.2],
+}
+LANGUAGES = (['Arabic', 'Tigrinya', 'Somali', 'Oromo', 'Amharic', 'English', 'Other'],
+             [0.7, 0.1, 0.06, 0.04, 0.05, 0.03, 0.02])
+
+CHANGES = 'Is there anything you would change or remove to make the help website easier to use and/or is anything missing, perhaps a topic you would like to know more about?'
+SERVICES = 'What UNHCR services would you like to be able to access digitally / online?'
+SHARING = "How do you feel about sharing your personal information such as your name, biometric data or other identity documents and details to help identify you for access to UNHCR's services online?"
+SERVICES_EASE = 'Do you find these services easy to use? Please explain. '
+FREE_TEXT = {
+    CHANGES: (['', 'No', 'no thank you', 'Please add the RSD result of first instance and appeal',
+               'a live chat to talk with staff would help', 'update the website more regularly',
+               'add a complaint box', 'more details about my case status', 'thanks UNHCR'],
+              [0.45, 0.2, 0.05, 0.08, 0.05, 0.05, 0.04, 0.04, 0.04]),
+    SERVICES: (['', 'nothing', 'RSD interview date and result', 'registration renewal online',
+                'information on assistance and services', 'resettlement file', 'complaints', 'protection'],
+               [0.3, 0.05, 0.17, 0.12, 0.12, 0.1, 0.07, 0.07]),
+    SHARING: (['', 'I am fine with it', 'no problem', 'I am not comfortable, data is not safe on the internet',
+               'afraid it will be shared with the government'],
+              [0.25, 0.4, 0.15, 0.12, 0.08]),
+    SERVICES_EASE: (['', 'Yes', 'yes easy', 'No, I cannot read', 'no internet at home', 'neither easy nor difficult'],
+                    [0.35, 0.35, 0.1, 0.08, 0.07, 0.05]),
+}
+
+# follow-up questions the report does not chart; answered by a minority, at paragraph length
+FILLER = [
+    'If other, please specify how you found our website',
+    'Why is the website difficult to use? Please explain.',
+    'Which information were you looking for today?',
+    'Did you find what you were looking for? If not, what was missing?',
+    'Please describe any problem you had while using the website',
+    'Which online services from other organisations do you use, and what for?',
+    'Please leave your phone number or email address so we can contact you',
+    'Any other comments?',
+]
+FILLER_SKIPPED = 0.6
+FILLER_WORDS = ('i we the a my our your website page information case file interview result appeal office '
+                'registration card renewal appointment phone email number address language arabic english '
+                'cannot could not find need want please help update more about when where how why because '
+                'however, also, and, but, thanks, unhcr staff service services online internet slow mobile '
+                'read understand difficult easy days weeks months waiting still no yes family children').split()
+
+
+def filler_pool(rng, size=5000):
+    # distinct answers of lognormal length (about 15 words, up to a few hundred), sampled per row
+    lengths = np.clip(rng.lognormal(np.log(15), 0.9, size).astype(int), 1, 400)
+    answers = [' '.join(rng.choice(FILLER_WORDS, k)).capitalize().rstrip(',') + '.' for k in lengths]
+    return np.array(answers, dtype=object)
+
+
+def header(column):
+    return column[0].upper() + column[1:]
+
+
+def generate(rows, seed=0, chunksize=100000, start='2021-02-01', days=34, filler=True):
+    # Yields the export in chunks, in submission order, so a million rows never sit in memory at once.
+    rng = np.random.default_rng(seed)
+    pool = filler_pool(rng) if filler else None
+    # submissions are quiet between 1 and 7 AM, like the real survey
+    hour_weights = np.where((np.arange(24) >= 1) & (np.arange(24) < 7), 18, 51).astype(float)
+    offsets = (rng.integers(0, days, rows) * 86400 + rng.choice(24, rows, p=hour_weights / hour_weights.sum()) * 3600
+               + rng.integers(0, 3600, rows))
+    offsets.sort()
+
+    for first in range(0, rows, chunksize):
+        n = min(chunksize, rows - first)
+        submitted = pd.Timestamp(start) + pd.to_timedelta(offsets[first:first + n], unit='s')
+        duration = pd.to_timedelta(np.exp(rng.normal(np.log(360), 0.9, n)).round(), unit='s')
+        end = submitted - pd.to_timedelta(rng.integers(1, 30, n), unit='s')
+        begin = end - duration
+
+        data = {
+            'start': begin.strftime('%Y-%m-%dT%H:%M:%S.000+02:00'),
+            'end': end.strftime('%Y-%m-%dT%H:%M:%S.000+02:00'),
+            'deviceid': rng.integers(10 ** 14, 10 ** 15, n).astype(str),
+        }
+        for column, weights in WEIGHTS.items():
+            data[header(column)] = rng.choice(CATEGORY_ORDERS[column], n, p=weights)
+        data[header(LANGUAGE)] = rng.choice(LANGUAGES[0], n, p=LANGUAGES[1])
+        for question, (answers, weights) in FREE_TEXT.items():
+            data[question] = rng.choice(answers, n, p=weights)
+        if filler:
+            for question in FILLER:
+                data[question] = np.where(rng.random(n) < FILLER_SKIPPED, '', pool[rng.integers(0, len(pool), n)])
+        data['_id'] = np.arange(first, first + n) + 10000000
+        data['_uuid'] = ['%032x' % i for i in rng.integers(0, 2 ** 62, n)]
+        data['_submission_time'] = submitted.strftime('%Y-%m-%dT%H:%M:%S')
+        data['duplicated_contact'] = (rng.random(n) < 0.05).astype(int)
+        yield pd.DataFrame(data)
+
+
+def free_text_counts(chunk):
+    # same (question, response, count) layout as data_freetext.csv
+    frames = []
+    for question in FREE_TEXT:
+        answers = chunk[question].replace('', 'No answer').value_counts()
+        frames.append(pd.DataFrame({'question': question, 'response': answers.index, 'count': answers.values}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def write(rows, path, seed=0, filler=True):
+    free_text = []
+    for i, chunk in enumerate(generate(rows, seed, filler=filler)):
+        chunk.to_csv(path, index=False, mode='w' if i == 0 else 'a', header=i == 0)
+        free_text.append(free_text_counts(chunk))
+    free_text = pd.concat(free_text).groupby(['question', 'response'], sort=False)['count'].sum().reset_index()
+    free_text.to_csv(free_text_path(path), index=False)
+
+
+def free_text_path(path):
+    root, ext = os.path.splitext(path)
+    return root + '_freetext' + ext
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('rows', type=int)
+    parser.add_argument('path')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-filler', action='store_true', help='leave out the long free-text columns the report does not read')
+    args = parser.parse_args()
+
+    write(args.rows, args.path, args.seed, filler=not args.no_filler)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""Headless benchmark of app.py against synthetic survey exports.
+
+    python bench/run.py                       # 1k, 10k, 100k and 1M respondents
+    python bench/run.py --rows 1000 10000 --data-dir /tmp/survey-bench
+
+Each size runs in fresh processes through Streamlit's AppTest, with SURVEY_DATA_URL and
+SURVEY_FREE_TEXT_PATH pointed at generated files. Reported per size:
+
+    cold      first page load with no snapshot on disk (fetch + parse + summarize + render)
+    restart   first page load in a new process once the snapshot exists
+    rerun     median full rerun with nothing changed
+    open      opening every lazy section
+    base      median full rerun with every section open and nothing changed
+    select    median / max full rerun after changing one selectbox, then each selectbox by label
+              with its cost over `base`
+    rss_mb    peak resident memory of the cold-start process
+
+AppTest always re-executes the whole script: it cannot rerun a single fragment. So the select
+times are full reruns with every section open, not the section-only reruns that st.fragment
+gives a browser session. The `base` rerun is what every one of them pays regardless; the time
+over it is the work of the changed section (cache lookups, building its figure), which is
+roughly what a fragment rerun of that section costs.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+
+from generate import free_text_path, write  # noqa: E402
+
+
+# keys of the lazy_section expanders in app.py
+SECTIONS = ['country', 'language', 'ease', 'frequency', 'changes', 'smartphone', 'internet', 'services',
+            'online_services', 'contact', 'waves']
+SIZES = [1000, 10000, 100000, 1000000]
+
+
+def timed(action):
+    started = time.perf_counter()
+    action()
+    return time.perf_counter() - started
+
+
+def open_sections(app):
+    # AppTest does not carry expander state over to the next run, so it is set before each one
+    for key in SECTIONS:
+        app.session_state[key] = True
+
+
+def measure(reruns):
+    # runs inside the child process; cwd is the repo root and the SURVEY_* variables are set
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.join(ROOT, 'app.py'), default_timeout=3600)
+    result = {'first': timed(app.run)}
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+    result['rerun'] = statistics.median(timed(app.run) for _ in range(reruns))
+
+    open_sections(app)
+    result['open'] = timed(app.run)
+    base = []
+    for _ in range(reruns):
+        open_sections(app)
+        base.append(timed(app.run))
+    result['base'] = statistics.median(base)
+
+    # selectbox labels are unique in app.py, so they name the interaction
+    selects = {}
+    for selectbox in app.selectbox:
+        label = selectbox.label
+        open_sections(app)
+        selectbox.select(selectbox.options[-1])
+        selects[label] = timed(app.run)
+        if app.exception:
+            raise RuntimeError(app.exception[0].value)
+    result['selects'] = selects
+    result['select_median'] = statistics.median(selects.values())
+    result['select_max'] = max(selects.values())
+    result['rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+
+def run_child(path, snapshot_dir, reruns):
+    env = dict(os.environ, SURVEY_DATA_URL=path, SURVEY_FREE_TEXT_PATH=free_text_path(path),
+               SURVEY_SNAPSHOT_DIR=snapshot_dir, PYTHONPATH=ROOT)
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', '--reruns', str(reruns)],
+                            cwd=ROOT, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--data-dir', help='keep generated exports here and reuse them between runs')
+    parser.add_argument('--reruns', type=int, default=5)
+    parser.add_argument('--no-filler', action='store_true',
+                        help='generate exports without the unused long-text columns (to see what projecting them away saves)')
+    parser.add_argument('--json', action='store_true', help='print one JSON object per size instead of a table')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.reruns)))
+        return
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='survey-bench-')
+    os.makedirs(data_dir, exist_ok=True)
+    if not args.json:
+        print('%9s %9s %9s %9s %9s %9s %10s %10s %9s' % (
+            'rows', 'cold', 'restart', 'rerun', 'open', 'base', 'select', 'select max', 'rss_mb'))
+    for rows in args.rows:
+        path = os.path.join(data_dir, 'survey_%d%s.csv' % (rows, '_nofiller' if args.no_filler else ''))
+        if not os.path.exists(path):
+            write(rows, path, filler=not args.no_filler)
+        snapshot_dir = tempfile.mkdtemp(prefix='snapshots-', dir=data_dir)
+        try:
+            cold = run_child(path, snapshot_dir, args.reruns)
+            restart = run_child(path, snapshot_dir, args.reruns)
+        finally:
+            shutil.rmtree(snapshot_dir)
+        result = {'rows': rows, 'cold': cold['first'], 'restart': restart['first'], 'rerun': cold['rerun'],
+                  'open': cold['open'], 'base': cold['base'], 'select_median': cold['select_median'], 'select_max': cold['select_max'],
+                  'rss_mb': cold['rss_mb'], 'selects': cold['selects']}
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print('%9d %8.2fs %8.2fs %8.3fs %8.3fs %8.3fs %9.3fs %9.3fs %9.0f' % (
+                rows, result['cold'], result['restart'], result['rerun'], result['open'], result['base'],
+                result['select_median'], result['select_max'], result['rss_mb']))
+            for label, seconds in result['selects'].items():
+                print('%9s %8.3fs %+8.3fs  %s' % ('', seconds, seconds - result['base'], label))
+    if not args.data_dir:
+        shutil.rmtree(data_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+import collections
+import concurrent.futures
+import datetime
+import json
+import logging
+import os
+import threading
+
+import pandas as pd
+
+from aggregates import merge_summaries, summarize
+from artifact import WAVES, read_artifact
+from free_text import counts_frame, load_taxonomy
+from profiling import breakdown, stage
+from survey_data import CHUNKSIZE, DATA_URL, REFRESH_SECONDS, stream_survey, update_snapshot
+
+
+logger = logging.getLogger(__name__)
+
+# hand-coded (question, response, count) table, only used for open-ended questions the export
+# has no answers for; answers in the export are coded with the taxonomy in free_text.py
+FREE_TEXT_PATH = os.environ.get('SURVEY_FREE_TEXT_PATH', 'data_freetext.csv')
+# JSON list of survey waves, [{"name": ..., "url": ..., "free_text": ..., "columns": {...}}, ...];
+# without it the report covers the single wave at SURVEY_DATA_URL / SURVEY_FREE_TEXT_PATH
+WAVES_PATH = os.environ.get('SURVEY_WAVES')
+DEFAULT_WAVE = 'February 2021'
+# serving mode: read only the prebuilt aggregates written by `python artifact.py`, never the export
+ARTIFACT = os.environ.get('SURVEY_ARTIFACT')
+# retained versions (raw frame, deduped frame, free text) may use this much memory in total;
+# the current version is always kept even if it alone is larger
+MEMORY_BUDGET = int(os.environ.get('SURVEY_MEMORY_BUDGET_MB', '512')) * 2 ** 20
+
+# Process-wide: every Streamlit session reads the same objects, and a background thread publishes
+# new versions. A published state holds each wave's own state under 'waves' and a summary merged
+# over all of them. It is never mutated (a refresh builds a new dict and new frames;
+# with pandas copy-on-write, frames derived from it never write back), so sessions share it
+# without copies or locks.
+_state = None
+_versions = collections.OrderedDict()
+_lock = threading.RLock()
+_refresher = None
+_stop = threading.Event()
+
+
+def now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def frame_sizes(*frames, known=None):
+    # bytes per distinct frame, keyed by id(): versions that share a frame (a wave that did not
+    # change, an unchanged free-text table) count it once. States hold the frames, so the ids stay
+    # unique while any retained version refers to them. Sizes in `known` are not measured again.
+    known = known or {}
+    return {id(f): known.get(id(f)) or int(f.memory_usage(deep=True).sum()) for f in frames if f is not None}
+
+
+def retained_bytes(states):
+    sizes = {}
+    for state in states:
+        sizes.update(state['frames'])
+    return sum(sizes.values())
+
+
+def registry():
+    # Waves in report order. Export headers are matched to the schema case-insensitively; a wave's
+    # optional "columns" maps differently worded headers onto schema columns.
+    if ARTIFACT:
+        with open(os.path.join(ARTIFACT, WAVES)) as f:
+            return [dict(wave, artifact=os.path.join(ARTIFACT, wave['artifact'])) for wave in json.load(f)]
+    if WAVES_PATH:
+        with open(WAVES_PATH) as f:
+            return json.load(f)
+    return [{'name': DEFAULT_WAVE, 'url': DATA_URL, 'free_text': FREE_TEXT_PATH}]
+
+
+def load_hand_coded(path, previous):
+    if not path or not os.path.exists(path):
+        return None, 0
+    modified = os.path.getmtime(path)
+    if previous is not None and previous['hand_coded_modified'] == modified:
+        return previous['hand_coded'], modified
+    table = pd.read_csv(path)
+    # questions are keyed like the schema's columns
+    return table.assign(question=table['question'].str.lower()), modified
+
+
+def coded_free_text(summary, taxonomy, hand_coded):
+    free_text = counts_frame(summary.get('free_text'), taxonomy)
+    if hand_coded is not None:
+        missing = hand_coded[~hand_coded['question'].isin(free_text['question'])]
+        free_text = pd.concat([free_text, missing], ignore_index=True)
+    return free_text
+
+
+def build(wave, previous):
+    taxonomy, taxonomy_modified = load_taxonomy()
+    hand_coded, hand_coded_modified = load_hand_coded(wave.get('free_text'), previous)
+    state = {'hand_coded': hand_coded, 'hand_coded_modified': hand_coded_modified,
+             'taxonomy_modified': taxonomy_modified}
+    url = wave['url']
+    aliases = {header.lower(): column for header, column in wave.get('columns', {}).items()}
+
+    # every chart is drawn from the summary's count tables, never from the full respondent frame
+    if CHUNKSIZE:
+        with stage('summarize'):
+            summary = summarize(stream_survey(url, CHUNKSIZE, aliases), taxonomy=taxonomy)
+        combinations = summary['combinations'].reset_index()
+        summary['version'] = 'stream-%x' % (pd.util.hash_pandas_object(combinations, index=False).sum() & 0xffffffffffff)
+        state.update(data=None, summary=summary, updated_at=now())
+    else:
+        # served from the on-disk parquet snapshot; when the sheet has only gained rows, just those
+        # rows are parsed and folded into the previous summary
+        with stage('snapshot'):
+            data, delta = update_snapshot(url, previous=previous and previous['data'], aliases=aliases)
+        summary = previous and previous['summary']
+        updated_at = previous and previous['updated_at']
+        # free-text answers are coded as they are summarized, so a new taxonomy means a full rebuild
+        if (delta is None or summary is None or summary['version'] != delta.attrs['base']
+                or previous['taxonomy_modified'] != taxonomy_modified):
+            with stage('summarize', rows=len(data)):
+                summary = summarize([data], taxonomy=taxonomy)
+            summary['version'] = data.attrs['version']
+            updated_at = now()
+        elif len(delta):
+            # fold into a copy: sessions still rendering the previous summary keep a consistent view
+            with stage('summarize', rows=len(delta)):
+                summary = summarize([delta], dict(summary), taxonomy)
+            summary['version'] = data.attrs['version']
+            updated_at = now()
+        # the respondent rows are kept only to fold the next appended rows onto; duplicates are
+        # left out by summarize, so no deduplicated copy is held
+        state.update(data=data, summary=summary, updated_at=updated_at)
+
+    if previous is not None and previous['summary'] is summary and previous['hand_coded'] is hand_coded:
+        free_text = previous['free_text']
+    else:
+        with stage('free_text'):
+            free_text = coded_free_text(summary, taxonomy, hand_coded)
+    state['free_text'] = free_text
+    state['version'] = '%s-%d-%d' % (summary['version'], hand_coded_modified, taxonomy_modified)
+    state['frames'] = frame_sizes(state['data'], free_text, hand_coded, summary['sample'],
+                                  known=previous and previous['frames'])
+    return state
+
+
+def load(wave, previous):
+    if 'artifact' in wave:
+        with stage('artifact'):
+            return read_artifact(wave['artifact'], previous)
+    return build(wave, previous)
+
+
+def refresh_wave(wave, previous):
+    # a wave that fails to refresh keeps serving its last good state
+    try:
+        # the build's own breakdown travels with the state, for the debug panel of later reruns
+        with breakdown('build:' + wave['name']) as records:
+            state = load(wave, previous)
+        state['profile'] = records
+    except Exception as e:
+        if previous is None:
+            raise
+        logger.exception('refresh of survey wave %s failed', wave['name'])
+        state = dict(previous, error=str(e))
+    return state
+
+
+def merge_free_text(tables):
+    if len(tables) == 1:
+        return tables[0]
+    return pd.concat(tables).groupby(['question', 'response'], sort=False)['count'].sum().reset_index()
+
+
+def combine(waves):
+    states = list(waves.values())
+    summary = merge_summaries([s['summary'] for s in states])
+    free_text = merge_free_text([s['free_text'] for s in states])
+    state = {'waves': waves, 'summary': summary, 'free_text': free_text,
+             'updated_at': max(s['updated_at'] for s in states),
+             'version': '+'.join(s['version'] for s in states),
+             'profile': [record for s in states for record in s.get('profile', [])],
+             'frames': {key: size for s in states for key, size in s['frames'].items()}}
+    if len(states) > 1:
+        state['frames'].update(frame_sizes(free_text, summary['sample']))
+    # the page shows these next to the data's age
+    errors = ['%s: %s' % (name, s['error']) for name, s in waves.items() if s.get('error')]
+    if errors:
+        state['error'] = '; '.join(errors)
+    return state
+
+
+def publish(state):
+    global _state
+    _versions[state['version']] = state
+    _versions.move_to_end(state['version'])
+    _state = state
+    total = retained_bytes(_versions.values())
+    while total > MEMORY_BUDGET and len(_versions) > 1:
+        version, _ = _versions.popitem(last=False)
+        # only the frames no newer version shares are freed
+        freed, total = total, retained_bytes(_versions.values())
+        logger.info('evicted survey dataset %s (%d bytes)', version, freed - total)
+
+
+def refresh():
+    with _lock:
+        previous = _state['waves'] if _state is not None else {}
+        waves = registry()
+        # Waves load on their own threads (fetching and parsing spend most of their time outside
+        # the GIL), so a refresh takes as long as the slowest wave rather than the sum of them.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(waves), thread_name_prefix='survey-wave') as pool:
+            futures = {wave['name']: pool.submit(refresh_wave, wave, previous.get(wave['name'])) for wave in waves}
+        states = collections.OrderedDict()
+        for name, future in futures.items():
+            try:
+                states[name] = future.result()
+            except Exception:
+                # a newly registered wave that cannot be loaded yet is left out until it can
+                if _state is None:
+                    raise
+                logger.exception('survey wave %s could not be loaded', name)
+        if not states:
+            raise RuntimeError('no survey wave could be loaded')
+        state = combine(states)
+        state['checked_at'] = now()
+        publish(state)
+    return state
+
+
+def run_refresher(interval):
+    while not _stop.wait(interval):
+        try:
+            refresh()
+        except Exception:
+            logger.exception('survey refresh failed')
+
+
+def current():
+    # Last good dataset, without waiting on the source. Only the very first call in a process
+    # blocks on a load; after that a daemon thread revalidates every REFRESH_SECONDS.
+    global _refresher
+    if _state is None:
+        with _lock:
+            if _state is None:
+                refresh()
+    if _refresher is None or not _refresher.is_alive():
+        with _lock:
+            if _refresher is None or not _refresher.is_alive():
+                _refresher = threading.Thread(target=run_refresher, args=(REFRESH_SECONDS,),
+                                              name='survey-refresher', daemon=True)
+                _refresher.start()
+    return _state
+
+
+def get(version):
+    # A specific retained version (so a session can keep a consistent view across reruns),
+    # falling back to the current one once it has been evicted.
+    state = _versions.get(version)
+    return state if state is not None else current()
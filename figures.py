@@ -0,0 +1,56 @@
+import collections
+import functools
+import logging
+import os
+import threading
+
+from profiling import add, stage
+
+
+logger = logging.getLogger(__name__)
+
+MAX_FIGURES = int(os.environ.get('SURVEY_FIGURE_CACHE_SIZE', '256'))
+
+# Process-wide LRU of built figures keyed by (chart, dataset version, filter values), each with
+# the size of its JSON. A hit hands back the cached figure itself: no pandas or plotly express
+# work, and no parsing and re-validating a figure from JSON (which costs a good part of a build).
+# Sessions share the objects, so callers only render them and never modify them.
+_figures = collections.OrderedDict()
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+
+def memoized(chart):
+    # Decorates a figure builder `build(*filters)`; call the result as `chart_fn(version, *filters)`.
+    def decorate(build):
+        @functools.wraps(build)
+        def wrapper(version, *filters):
+            key = (chart, version) + filters
+            with _lock:
+                entry = _figures.get(key)
+                if entry is not None:
+                    _figures.move_to_end(key)
+                    _stats['hits'] += 1
+            if entry is None:
+                with stage('build_figure', chart=chart):
+                    fig = build(*filters)
+                    # serialized once here, so a figure that cannot be sent fails when it is built
+                    entry = fig, len(fig.to_json())
+                with _lock:
+                    _stats['misses'] += 1
+                    _figures[key] = entry
+                    while len(_figures) > MAX_FIGURES:
+                        evicted, _ = _figures.popitem(last=False)
+                        _stats['evictions'] += 1
+                        logger.debug('evicted figure %s', evicted)
+            # roughly what the browser receives for this chart
+            add('figure_bytes', entry[1])
+            return entry[0]
+        return wrapper
+    return decorate
+
+
+def stats():
+    # counters for sizing SURVEY_FIGURE_CACHE_SIZE
+    with _lock:
+        return dict(_stats, size=len(_figures), bytes=sum(size for _, size in _figures.values()))
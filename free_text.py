@@ -0,0 +1,80 @@
+import json
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+# Keyword taxonomy for the open-ended questions: for each question (export header), an ordered
+# mapping of category -> keywords/phrases, plus the labels for blank and unmatched answers.
+TAXONOMY_PATH = os.environ.get('SURVEY_TAXONOMY', 'taxonomy.json')
+
+_compiled = {}
+_lock = threading.Lock()
+
+
+def compile_question(spec):
+    # One case-insensitive alternation over every keyword of every category, longest first: the
+    # earliest keyword in an answer decides its category, and at the same position the longer
+    # phrase wins ("no problem" over "no").
+    labels = {}
+    for category, keywords in spec['categories'].items():
+        for keyword in keywords:
+            labels.setdefault(' '.join(keyword.lower().split()), category)
+    alternatives = sorted(labels, key=len, reverse=True)
+    pattern = r'\b(%s)\b' % '|'.join(re.escape(k).replace(r'\ ', r'\s+') for k in alternatives)
+    return {'pattern': re.compile(pattern, re.IGNORECASE), 'labels': labels,
+            'order': list(spec['categories']) + list(dict.fromkeys([spec['other'], spec['empty']])),
+            'empty': spec['empty'], 'other': spec['other']}
+
+
+def load_taxonomy(path=TAXONOMY_PATH):
+    # (taxonomy, mtime); compiled once per version of the file, keyed by lowercased question
+    modified = os.path.getmtime(path)
+    with _lock:
+        cached = _compiled.get(path)
+        if cached is None or cached[1] != modified:
+            with open(path) as f:
+                spec = json.load(f)
+            cached = {question.lower(): compile_question(q) for question, q in spec.items()}, modified
+            _compiled[path] = cached
+    return cached
+
+
+def code_answers(answers, coder):
+    # Category per answer, for the whole column at once. Each distinct answer is matched once,
+    # and the matching runs in the regex engine rather than a Python loop over rows.
+    answers = answers.astype('category')
+    text = pd.Series(answers.cat.categories).astype(str)
+    found = text.str.extract(coder['pattern'], expand=False).str.lower().str.replace(r'\s+', ' ', regex=True)
+    labels = found.map(coder['labels']).fillna(coder['other'])
+    labels[text.str.strip() == ''] = coder['empty']
+    codes = answers.cat.codes.to_numpy()
+    return np.where(codes >= 0, labels.to_numpy()[codes], coder['empty'])
+
+
+def categorize(data, taxonomy):
+    # (question, category) -> respondent count for every coded question `data` has answers for
+    tables = []
+    for question, coder in taxonomy.items():
+        if question not in data or data[question].isna().all():
+            continue
+        counts = pd.Series(code_answers(data[question], coder)).value_counts()
+        counts.index = pd.MultiIndex.from_product([[question], counts.index], names=['question', 'response'])
+        tables.append(counts)
+    if not tables:
+        return None
+    return pd.concat(tables).rename('count')
+
+
+def counts_frame(counts, taxonomy):
+    # (question, response, count) rows in taxonomy order, the layout of data_freetext.csv
+    if counts is None:
+        return pd.DataFrame(columns=['question', 'response', 'count'])
+    frame = counts.rename('count').reset_index()
+    rank = {key: i for i, key in enumerate((question, label) for question, coder in taxonomy.items()
+                                           for label in coder['order'])}
+    order = [rank.get(key, len(rank)) for key in zip(frame['question'], frame['response'])]
+    return frame.iloc[np.argsort(order, kind='stable')].reset_index(drop=True)
@@ -0,0 +1,110 @@
+import contextlib
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+
+
+logger = logging.getLogger(__name__)
+
+# SURVEY_PROFILE=1 times every stage and section and counts payload bytes; SURVEY_PROFILE=memory
+# also traces allocations (tracemalloc slows Python down noticeably, so timings get inflated).
+# Unset, stage() hands back one shared no-op context manager and add() returns straight away.
+PROFILE = os.environ.get('SURVEY_PROFILE', '')
+ENABLED = PROFILE not in ('', '0')
+MEMORY = PROFILE == 'memory'
+
+# Records are kept per thread: a Streamlit rerun and a background dataset build each get their own
+# breakdown. tracemalloc is process-wide, so allocation figures are approximate while other
+# sessions run at the same time.
+_local = threading.local()
+_noop = contextlib.nullcontext()
+_runs = itertools.count(1)
+
+if ENABLED:
+    if not logger.handlers:
+        # structured JSON lines for monitoring, whether or not the host app configured logging
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel(logging.INFO)
+    if MEMORY:
+        tracemalloc.start()
+
+
+def start(kind):
+    # Begin a new breakdown on this thread; returns its record list (filled in as stages finish).
+    if not ENABLED:
+        return []
+    _local.run = {'run': next(_runs), 'kind': kind}
+    _local.records = []
+    _local.open = []
+    return _local.records
+
+
+@contextlib.contextmanager
+def breakdown(kind):
+    # a separate breakdown for the duration, e.g. a dataset build triggered from inside a rerun
+    saved = dict(_local.__dict__)
+    try:
+        yield start(kind)
+    finally:
+        _local.__dict__.clear()
+        _local.__dict__.update(saved)
+
+
+def records():
+    return getattr(_local, 'records', [])
+
+
+def stage(name, **fields):
+    # with stage('parse'): ...  — wall time, net and peak traced allocation, and anything add()ed
+    if not ENABLED:
+        return _noop
+    return _stage(name, fields)
+
+
+def add(counter, value=1):
+    # bump a counter (e.g. payload bytes) on the innermost open stage
+    if not ENABLED:
+        return
+    frames = getattr(_local, 'open', None)
+    if frames:
+        frames[-1][counter] = frames[-1].get(counter, 0) + value
+
+
+@contextlib.contextmanager
+def _stage(name, fields):
+    if not hasattr(_local, 'open'):
+        start('thread')
+    frames = _local.open
+    record = dict(_local.run, stage=name, depth=len(frames), **fields)
+    if frames:
+        record['parent'] = frames[-1]['stage']
+    if MEMORY:
+        current, peak = tracemalloc.get_traced_memory()
+        if frames:
+            frames[-1]['_peak'] = max(frames[-1]['_peak'], peak)
+        tracemalloc.reset_peak()
+        record['_start'], record['_peak'] = current, current
+    frames.append(record)
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['seconds'] = round(time.perf_counter() - started, 6)
+        frames.pop()
+        if MEMORY:
+            current, peak = tracemalloc.get_traced_memory()
+            record['_peak'] = max(record['_peak'], peak)
+            if frames:
+                frames[-1]['_peak'] = max(frames[-1]['_peak'], record['_peak'])
+            began = record.pop('_start')
+            record['allocated_bytes'] = current - began
+            record['peak_bytes'] = record.pop('_peak') - began
+        _local.records.append(record)
+        logger.info(json.dumps(record, default=str))
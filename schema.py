@@ -0,0 +1,70 @@
+import hashlib
+
+
+# Columns of the survey export the report uses, keyed by their lowercased header.
+# Everything else in the export (metadata, questions the report does not chart) is skipped at read time.
+
+FIND = 'how did you find our website today?'
+COUNTRY = "what's your country of origin?"
+LANGUAGE = 'what is your preferred language of communication?'
+EASE = 'how easy is our website to use?'
+AGE = 'your age'
+EDUCATION = 'your current education level'
+FREQUENCY = 'how often do you use our website?'
+SMARTPHONE = 'do you have your own smartphone?'
+INTERNET = 'do you always have access to the internet?'
+ONLINE_SERVICES = 'do you use any online services from other organisations such as the government, banks, other organisations like unhcr?'
+CONTACT = 'can we contact you again in future to help us improve our digital services?'
+
+# open-ended questions, coded into categories by free_text.py
+CHANGES = 'is there anything you would change or remove to make the help website easier to use and/or is anything missing, perhaps a topic you would like to know more about?'
+SERVICES = 'what unhcr services would you like to be able to access digitally / online?'
+SHARING = "how do you feel about sharing your personal information such as your name, biometric data or other identity documents and details to help identify you for access to unhcr's services online?"
+SERVICES_EASE = 'do you find these services easy to use? please explain. '
+TEXT_COLUMNS = [CHANGES, SERVICES, SHARING, SERVICES_EASE]
+
+DATE_COLUMNS = ['start', 'end', '_submission_time']
+# start/end carry the device's UTC offset, which can differ between respondents
+DATE_FORMATS = {
+    'start': {'format': 'ISO8601', 'utc': True},
+    'end': {'format': 'ISO8601', 'utc': True},
+    '_submission_time': {'format': 'ISO8601'},
+}
+
+CATEGORY_ORDERS = {
+    FIND: ['I found you on Google (or another search engine)',
+           'I typed the website address (URL) in directly',
+           'Another UNHCR website', 'A link on Twitter / Facebook / Instagram',
+           'Other', 'A link from WhatsApp / Viber / Telegram',
+           'A link on another website'],
+    COUNTRY: ['Sudanese', 'Eritrean', 'South Sudanese', 'Syrian', 'Ethiopian', 'Somali', 'Iraqi', 'Yemeni', 'Other'],
+    LANGUAGE: [],
+    EASE: ['Very easy', 'Easy', 'Neither easy nor difficult', 'Difficult', 'Very difficult'],
+    AGE: ['Under 18', '18-24', '25-34', '35-44', '45-54', '55-64', '65+'],
+    EDUCATION: ['No formal education', 'Elementary school', 'High school / college', "Bachelor's degree / technical college", 'Masters degree', 'PhD'],
+    FREQUENCY: ['Often (daily)', 'Regularly (weekly)', 'Sometimes (monthly)', 'Rarely (every few months)', 'This is the first time'],
+    SMARTPHONE: ['I have an Android smartphone', 'I have an Apple/iOS smartphone',
+                 'I share an Android smartphone with my family or friends',
+                 'I share an Apple/iOS smartphone with my family or friends',
+                 "I don't have access to a smartphone"],
+    INTERNET: ['Yes', 'No'],
+    ONLINE_SERVICES: ['Yes', 'No'],
+    CONTACT: ['Yes', 'No'],
+}
+
+SCHEMA = {
+    '_id': 'int64',
+    'duplicated_contact': 'Int8',
+    **{column: 'datetime' for column in DATE_COLUMNS},
+    **{column: 'category' for column in CATEGORY_ORDERS},
+    **{column: 'string' for column in TEXT_COLUMNS},
+}
+
+# changes whenever the schema does, so snapshots written under an older one are not reused
+SCHEMA_VERSION = hashlib.sha1(repr((SCHEMA, DATE_FORMATS, CATEGORY_ORDERS)).encode()).hexdigest()[:8]
+
+
+def order_categories(column, categories):
+    # Known answers in report order first; anything else the export contains keeps its place after them.
+    known = [c for c in CATEGORY_ORDERS.get(column, []) if c in categories]
+    return known + sorted(c for c in categories if c not in known)
@@ -0,0 +1,253 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import urllib.error
+import urllib.request
+
+import pandas as pd
+
+from profiling import add, stage
+from schema import DATE_COLUMNS, DATE_FORMATS, SCHEMA, SCHEMA_VERSION, order_categories
+
+# SURVEY_DATA_URL may point at another sheet, a local CSV path or a file:// URL (handy for tests)
+DATA_URL = os.environ.get('SURVEY_DATA_URL', 'https://docs.google.com/spreadsheets/d/e/2PACX-1vTKoYQrQUedW9pe9OR5N29XFAHvJBBrXIKmmG3E-nVRy-2ZPTSt1TjzwVe8KQq3Ng/pub?gid=1630645316&single=true&output=csv')
+SNAPSHOT_DIR = os.environ.get('SURVEY_SNAPSHOT_DIR', '.snapshots')
+# rows per chunk when streaming the export; 0 loads it whole through the snapshot instead
+CHUNKSIZE = int(os.environ.get('SURVEY_CHUNKSIZE', '0'))
+# how often the app checks the source for new submissions
+REFRESH_SECONDS = int(os.environ.get('SURVEY_REFRESH_SECONDS', '600'))
+
+
+def read_survey(buffer, nrows=None, chunksize=None, aliases=None):
+    # Project the export onto SCHEMA and cast while parsing; headers are matched case-insensitively.
+    # `aliases` maps other (lowercased) headers onto schema columns, for waves that worded a
+    # question differently. `buffer` is a binary file object and is read forwards only, so it can
+    # be a live HTTP response. With `chunksize` this returns an iterator of cleaned chunks instead
+    # of one frame.
+    aliases = aliases or {}
+    text = io.TextIOWrapper(buffer, encoding='utf-8-sig', newline='')
+    header = next(csv.reader([text.readline()]))
+    columns = {raw: aliases.get(raw.lower(), raw.lower()) for raw in header}
+    columns = {raw: column for raw, column in columns.items() if column in SCHEMA}
+    dtypes = {raw: SCHEMA[column] for raw, column in columns.items() if SCHEMA[column] != 'datetime'}
+    with stage('parse'):
+        reader = pd.read_csv(text, header=None, names=header, usecols=list(columns), dtype=dtypes,
+                             nrows=nrows, chunksize=chunksize)
+    if chunksize is None:
+        return clean_data(reader.rename(columns=columns))
+    return read_chunks(reader, columns)
+
+
+def read_chunks(reader, columns):
+    # chunks are parsed lazily, so each one is timed as it is pulled from the reader
+    while True:
+        with stage('parse'):
+            chunk = next(reader, None)
+        if chunk is None:
+            return
+        yield clean_data(chunk.rename(columns=columns))
+
+
+def open_source(url):
+    if is_local(url):
+        return open(url[len('file://'):] if url.startswith('file://') else url, 'rb')
+    return urllib.request.urlopen(url, timeout=60)
+
+
+def stream_survey(url=DATA_URL, chunksize=CHUNKSIZE or 50000, aliases=None):
+    # Cleaned chunks straight off the source; only one chunk is ever held in memory.
+    with open_source(url) as source:
+        yield from read_survey(source, chunksize=chunksize, aliases=aliases)
+
+
+def clean_data(data):
+    # a wave that did not ask a question still gets its column (all missing), so every wave has
+    # the same schema; without a duplicate flag every respondent counts
+    for column, dtype in SCHEMA.items():
+        if column not in data:
+            if dtype in ('category', 'string'):
+                data[column] = pd.Series(pd.NA, index=data.index, dtype=dtype)
+            elif dtype == 'datetime':
+                data[column] = pd.NaT
+            elif column == 'duplicated_contact':
+                data[column] = pd.Series(0, index=data.index, dtype=dtype)
+    with stage('parse_dates', rows=len(data)):
+        for column in DATE_COLUMNS:
+            data[column] = pd.to_datetime(data[column], **DATE_FORMATS[column])
+    with stage('order_categories'):
+        for column, dtype in SCHEMA.items():
+            if dtype == 'category' and column in data:
+                categories = order_categories(column, list(data[column].cat.categories))
+                data[column] = data[column].cat.reorder_categories(categories, ordered=True)
+    data['time_taken'] = data['end'] - data['start']
+    return data
+
+
+def is_local(url):
+    return url.startswith('file://') or '://' not in url
+
+
+def fetch_source(url, validators):
+    # Returns (body, validators); body is None when the source has not changed since `validators`.
+    if is_local(url):
+        with open_source(url) as f:
+            body = f.read()
+        headers = {}
+    else:
+        request = urllib.request.Request(url)
+        if validators.get('etag'):
+            request.add_header('If-None-Match', validators['etag'])
+        if validators.get('last_modified'):
+            request.add_header('If-Modified-Since', validators['last_modified'])
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                body = response.read()
+                headers = response.headers
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return None, validators
+            raise
+
+    new_validators = {
+        'etag': headers.get('ETag'),
+        'last_modified': headers.get('Last-Modified'),
+        # published sheets do not always send ETag/Last-Modified, so the body hash is the fallback
+        'sha256': hashlib.sha256(body).hexdigest(),
+    }
+    if new_validators['sha256'] == validators.get('sha256'):
+        return None, new_validators
+    return body, new_validators
+
+
+def snapshot_paths(url, nrows, snapshot_dir, aliases=None):
+    key = hashlib.sha1(('%s|%s|%s|%s' % (url, nrows, SCHEMA_VERSION, sorted((aliases or {}).items()))).encode()).hexdigest()[:16]
+    return os.path.join(snapshot_dir, key), os.path.join(snapshot_dir, key + '.json')
+
+
+def write_atomic(path, write):
+    tmp = path + '.tmp'
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def write_json(path, obj):
+    with open(path, 'w') as f:
+        json.dump(obj, f)
+
+
+def stamp_version(data, validators, nrows):
+    # content hash + row cap identifies a dataset version for downstream caches
+    data.attrs['version'] = '%s-%s' % (validators['sha256'][:12], nrows)
+    return data
+
+
+def concat_frames(frames):
+    # pd.concat turns categoricals with different categories into object columns, so unify them first
+    frames = [f for f in frames if len(f)] or frames[:1]
+    for column, dtype in SCHEMA.items():
+        if dtype != 'category' or column not in frames[0]:
+            continue
+        # (an all-missing column, from a wave that did not ask the question, reads back from parquet
+        # without a categorical dtype)
+        seen = dict.fromkeys(c for f in frames for c in f[column].astype('category').cat.categories)
+        categories = pd.CategoricalDtype(order_categories(column, list(seen)), ordered=True)
+        frames = [f.astype({column: categories}) for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def appended_rows(body, meta, aliases=None):
+    # If the export only grew (old bytes untouched), every row of the new tail is new, whatever its
+    # _submission_time; parse just the tail. None means rebuild. The old body must end on a full
+    # line: either with a newline, or (published sheets have no trailing newline) the new bytes go
+    # on with one.
+    size = meta.get('size')
+    if (not size or len(body) <= size
+            or (body[size - 1:size] != b'\n' and body[size:size + 1] not in (b'\r', b'\n'))
+            or hashlib.sha256(body[:size]).hexdigest() != meta['validators']['sha256']):
+        return None
+    header = body[:body.index(b'\n') + 1]
+    return read_survey(io.BytesIO(header + body[size:].lstrip(b'\r\n')), aliases=aliases)
+
+
+def update_snapshot(url=DATA_URL, nrows=None, snapshot_dir=SNAPSHOT_DIR, previous=None, max_parts=20, aliases=None):
+    # Returns (data, delta). delta holds the rows added since the snapshot (empty when unchanged,
+    # with delta.attrs['base'] the version it applies on top of), or is None when data was rebuilt.
+    # Appended rows are stored as extra parquet parts; `previous` (the frame of the last call) saves
+    # re-reading the parts from disk.
+    base_path, meta_path = snapshot_paths(url, nrows, snapshot_dir, aliases)
+    meta = {}
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if not meta.get('parts') or not all(os.path.exists(os.path.join(snapshot_dir, part)) for part in meta['parts']):
+            meta = {}
+
+    def stored():
+        version = '%s-%s' % (meta['validators']['sha256'][:12], nrows)
+        if previous is not None and previous.attrs.get('version') == version:
+            return previous
+        with stage('read_snapshot', parts=len(meta['parts'])):
+            return stamp_version(concat_frames([pd.read_parquet(os.path.join(snapshot_dir, part)) for part in meta['parts']]),
+                                 meta['validators'], nrows)
+
+    def unchanged(data):
+        delta = data.iloc[:0]
+        delta.attrs['base'] = data.attrs['version']
+        return data, delta
+
+    try:
+        with stage('fetch'):
+            body, validators = fetch_source(url, meta.get('validators', {}))
+            if body is not None:
+                add('payload_bytes', len(body))
+    except (OSError, urllib.error.URLError):
+        # source unreachable: keep serving the last good snapshot if there is one
+        if meta:
+            return unchanged(stored())
+        raise
+
+    if body is None:
+        data = stored()
+        if validators != meta['validators']:
+            meta['validators'] = validators
+            write_atomic(meta_path, lambda p: write_json(p, meta))
+        return unchanged(stamp_version(data, validators, nrows))
+
+    delta = appended_rows(body, meta, aliases) if meta and nrows is None else None
+    if delta is not None:
+        old = stored()
+        delta.attrs['base'] = old.attrs['version']
+        data = stamp_version(concat_frames([old, delta]), validators, nrows)
+        if len(meta['parts']) >= max_parts:
+            new_parts, write = [data], True
+        else:
+            new_parts, write = [delta] if len(delta) else [], False
+    else:
+        data = stamp_version(read_survey(io.BytesIO(body), nrows, aliases=aliases), validators, nrows)
+        new_parts, write = [data], True
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    counter = meta.get('next_part', 0)
+    parts = [] if write else list(meta['parts'])
+    try:
+        with stage('write_snapshot', parts=len(new_parts)):
+            for frame in new_parts:
+                part = '%s.%d.parquet' % (os.path.basename(base_path), counter)
+                write_atomic(os.path.join(snapshot_dir, part), frame.to_parquet)
+                parts.append(part)
+                counter += 1
+    except (ImportError, TypeError, ValueError):
+        # no parquet engine, or a column pyarrow cannot type: serve without persisting
+        return data, delta
+    new_meta = {'url': url, 'nrows': nrows, 'validators': validators, 'size': len(body),
+                'parts': parts, 'next_part': counter}
+    write_atomic(meta_path, lambda p: write_json(p, new_meta))
+    for part in set(meta.get('parts', [])) - set(parts):
+        os.remove(os.path.join(snapshot_dir, part))
+    return data, delta
+
+
+def load_snapshot(url=DATA_URL, nrows=None, snapshot_dir=SNAPSHOT_DIR):
+    return update_snapshot(url, nrows, snapshot_dir)[0]
@@ -0,0 +1,49 @@
+import os
+
+import pandas as pd
+import pytest
+
+from free_text import categorize, code_answers, load_taxonomy
+from schema import CHANGES, SHARING
+
+
+TAXONOMY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'taxonomy.json')
+
+
+@pytest.fixture(scope='module')
+def taxonomy():
+    return load_taxonomy(TAXONOMY)[0]
+
+
+def code(taxonomy, question, *answers):
+    return list(code_answers(pd.Series(answers, dtype='string'), taxonomy[question]))
+
+
+@pytest.mark.parametrize('answer, category', [
+    # the longer phrase wins at the same position: "no problem" over "no"
+    ('No problem', 'I am fine with it'),
+    ('NO   PROBLEM at all', 'I am fine with it'),
+    # the earliest keyword in the answer decides: "not fine" comes before "fine"
+    ('I am not fine with it', 'I am not fine with it'),
+    ('fine, but afraid it gets hacked', 'I am fine with it'),
+    ('afraid, even if it is fine for others', 'I am not fine with it'),
+])
+def test_sharing(taxonomy, answer, category):
+    assert code(taxonomy, SHARING, answer) == [category]
+
+
+def test_blank_and_missing_answers_are_empty(taxonomy):
+    assert code(taxonomy, CHANGES, '', '   ', None) == ['No answer'] * 3
+
+
+def test_unmatched_answers_are_other(taxonomy):
+    # keywords only match whole words: "no" is not found in "nobody", nor "la" in "salam"
+    assert code(taxonomy, CHANGES, 'salam, nobody told me', 'great work') == ['Not relevant'] * 2
+
+
+def test_categorize_counts_respondents(taxonomy):
+    data = pd.DataFrame({CHANGES: pd.Series(['No', 'nothing', 'add live chat', None], dtype='string')})
+    counts = categorize(data, taxonomy)
+    assert counts[(CHANGES, 'No')] == 2
+    assert counts[(CHANGES, 'Specific suggestions related to RSD')] == 1
+    assert counts[(CHANGES, 'No answer')] == 1
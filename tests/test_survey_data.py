@@ -0,0 +1,119 @@
+import json
+import os
+
+import pytest
+
+from survey_data import read_survey, snapshot_paths, update_snapshot
+
+
+HEADER = 'start,end,_id,_submission_time,Your age\n'
+
+
+def row(_id, submitted, age='25-34'):
+    return '2021-02-01T10:00:00+02:00,2021-02-01T10:05:00+02:00,%d,%s,%s\n' % (_id, submitted, age)
+
+
+@pytest.fixture
+def export(tmp_path):
+    path = tmp_path / 'survey.csv'
+    path.write_text(HEADER + row(1, '2021-02-01T10:05:01') + row(2, '2021-02-01T10:06:00') + row(3, '2021-02-01T10:07:00'))
+    return path
+
+
+def refresh(path, snapshot_dir, previous=None, max_parts=20):
+    return update_snapshot(str(path), snapshot_dir=str(snapshot_dir), previous=previous, max_parts=max_parts)
+
+
+def meta(path, snapshot_dir):
+    with open(snapshot_paths(str(path), None, str(snapshot_dir))[1]) as f:
+        return json.load(f)
+
+
+def append(path, *rows):
+    with open(path, 'a') as f:
+        f.write(''.join(rows))
+
+
+def assert_matches_export(data, path):
+    with open(path, 'rb') as f:
+        expected = read_survey(f)
+    assert sorted(data['_id']) == sorted(expected['_id'])
+
+
+def test_append_only(export, tmp_path):
+    snapshots = tmp_path / 'snapshots'
+    data, delta = refresh(export, snapshots)
+    assert delta is None and len(data) == 3
+
+    append(export, row(4, '2021-02-01T10:08:00'), row(5, '2021-02-01T10:09:00'))
+    data, delta = refresh(export, snapshots, data)
+    assert list(delta['_id']) == [4, 5]
+    assert_matches_export(data, export)
+    assert len(meta(export, snapshots)['parts']) == 2
+
+    data, delta = refresh(export, snapshots, data)
+    assert delta.empty and len(data) == 5
+
+
+def test_out_of_order_append_keeps_every_new_row(export, tmp_path):
+    snapshots = tmp_path / 'snapshots'
+    data, _ = refresh(export, snapshots)
+
+    # a late-synced submission, and one in the same second as the mark with a lower _id
+    append(export, row(7, '2021-01-31T09:00:00'), row(0, '2021-02-01T10:07:00'))
+    data, delta = refresh(export, snapshots, data)
+    assert sorted(delta['_id']) == [0, 7]
+    assert_matches_export(data, export)
+
+    # and the rows are still there when the snapshot is read back in a new process
+    data, delta = refresh(export, snapshots)
+    assert delta.empty
+    assert_matches_export(data, export)
+
+
+def test_append_to_export_without_trailing_newline(tmp_path):
+    # published sheets end on the last row, and new rows come after a line break
+    export = tmp_path / 'survey.csv'
+    export.write_bytes((HEADER + row(1, '2021-02-01T10:05:01') + row(2, '2021-02-01T10:06:00')).rstrip('\n').encode())
+    snapshots = tmp_path / 'snapshots'
+    data, _ = refresh(export, snapshots)
+
+    for _id in (3, 4):
+        with open(export, 'ab') as f:
+            f.write(('\r\n' + row(_id, '2021-02-01T10:0%d:00' % (_id + 4)).rstrip('\n')).encode())
+        data, delta = refresh(export, snapshots, data)
+        assert delta is not None
+        assert list(delta['_id']) == [_id]
+    assert_matches_export(data, export)
+
+
+def test_edited_prefix_rebuilds(export, tmp_path):
+    snapshots = tmp_path / 'snapshots'
+    data, _ = refresh(export, snapshots)
+
+    export.write_text(export.read_text().replace('25-34', '18-24', 1) + row(4, '2021-02-01T10:08:00'))
+    data, delta = refresh(export, snapshots, data)
+    assert delta is None
+    assert_matches_export(data, export)
+    assert list(data['your age']).count('18-24') == 1
+    assert len(meta(export, snapshots)['parts']) == 1
+
+
+def test_parts_are_compacted_after_max_parts(export, tmp_path):
+    snapshots = tmp_path / 'snapshots'
+    data, _ = refresh(export, snapshots, max_parts=2)
+
+    append(export, row(4, '2021-02-01T10:08:00'))
+    data, delta = refresh(export, snapshots, data, max_parts=2)
+    assert len(delta) == 1
+    assert len(meta(export, snapshots)['parts']) == 2
+
+    append(export, row(5, '2021-02-01T10:09:00'))
+    data, delta = refresh(export, snapshots, data, max_parts=2)
+    assert list(delta['_id']) == [5]
+    parts = meta(export, snapshots)['parts']
+    assert len(parts) == 1
+    assert sorted(os.listdir(snapshots)) == sorted(parts + [os.path.basename(snapshot_paths(str(export), None, str(snapshots))[1])])
+
+    data, _ = refresh(export, snapshots)
+    assert_matches_export(data, export)